@@ -1,12 +1,19 @@
 import logging
+import os
 import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
 
-from smart_contracts._helpers.build import build
+from smart_contracts._helpers.build import (
+    build,
+    build_in_process,
+    has_in_process_backend,
+)
 from smart_contracts._helpers.config import contracts
 from smart_contracts._helpers.deploy import deploy
+from smart_contracts._helpers.metrics import metrics
+from smart_contracts._helpers.watch import watch
 
 # Uncomment the following lines to enable auto generation of AVM Debugger compliant sourcemap and simulation trace file.
 # Learn more about using AlgoKit AVM Debugger to debug your TEAL source codes and inspect various kinds of
@@ -26,6 +33,8 @@ root_path = Path(__file__).parent
 
 def main(action: str, contract_name: str | None = None) -> None:
     artifact_path = root_path / "artifacts"
+    # compile in this process when puyapy is installed, otherwise shell out to algokit
+    build_contract = build_in_process if has_in_process_backend() else build
 
     # Filter contracts if a specific contract name is provided
     filtered_contracts = [
@@ -36,7 +45,7 @@ def main(action: str, contract_name: str | None = None) -> None:
         case "build":
             for contract in filtered_contracts:
                 logger.info(f"Building app at {contract.path}")
-                build(artifact_path / contract.name, contract.path)
+                build_contract(artifact_path / contract.name, contract.path)
         case "deploy":
             for contract in filtered_contracts:
                 output_dir = artifact_path / contract.name
@@ -54,19 +63,40 @@ def main(action: str, contract_name: str | None = None) -> None:
                 if contract.deploy:
                     logger.info(f"Deploying app {contract.name}")
                     deploy(app_spec_path, contract.deploy)
+        case "watch":
+            watch(filtered_contracts, artifact_path)
         case "all":
             for contract in filtered_contracts:
                 logger.info(f"Building app at {contract.path}")
-                app_spec_path = build(artifact_path / contract.name, contract.path)
+                app_spec_path = build_contract(
+                    artifact_path / contract.name, contract.path
+                )
                 if contract.deploy:
                     logger.info(f"Deploying {contract.path.name}")
                     deploy(app_spec_path, contract.deploy)
 
 
+def write_metrics() -> None:
+    # phase timings are always written as JSON; set SMART_CONTRACTS_METRICS_PROM to
+    # also write them in Prometheus text format
+    json_path = os.environ.get("SMART_CONTRACTS_METRICS_JSON")
+    prometheus_path = os.environ.get("SMART_CONTRACTS_METRICS_PROM")
+    metrics.write(
+        Path(json_path) if json_path else root_path / "artifacts" / "metrics.json",
+        Path(prometheus_path) if prometheus_path else None,
+    )
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
-        main(sys.argv[1], sys.argv[2])
-    elif len(sys.argv) > 1:
-        main(sys.argv[1])
-    else:
-        main("all")
+    try:
+        # the whole run is a phase too, so a failure outside the other phases (e.g. a
+        # missing app spec) still marks the run as failed
+        with metrics.phase("run"):
+            if len(sys.argv) > 2:
+                main(sys.argv[1], sys.argv[2])
+            elif len(sys.argv) > 1:
+                main(sys.argv[1])
+            else:
+                main("all")
+    finally:
+        write_metrics()
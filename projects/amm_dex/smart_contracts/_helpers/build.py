@@ -1,8 +1,13 @@
 import logging
+import re
 import subprocess
+import typing
+from importlib.util import find_spec
 from pathlib import Path
 from shutil import rmtree
 
+from smart_contracts._helpers.metrics import metrics
+
 logger = logging.getLogger(__name__)
 deployment_extension = "py"
 
@@ -15,61 +20,160 @@ def _get_output_path(output_dir: Path, deployment_extension: str) -> Path:
     )
 
 
-def build(output_dir: Path, contract_path: Path) -> Path:
+def _snake_case(name: str) -> str:
+    # same conversion `algokit generate client` applies to {contract_name}
+    name = name.replace("-", " ")
+    name = re.sub(r"([A-Z]+)([A-Z][a-z])", r"\1_\2", name)
+    name = re.sub(r"([a-z\d])([A-Z])", r"\1_\2", name)
+    return re.sub(r"[-\s]", "_", name).lower()
+
+
+def _prepare_output_dir(output_dir: Path, contract_path: Path) -> Path:
     output_dir = output_dir.resolve()
     if output_dir.exists():
         rmtree(output_dir)
     output_dir.mkdir(exist_ok=True, parents=True)
     logger.info(f"Exporting {contract_path} to {output_dir}")
+    return output_dir
+
 
-    build_result = subprocess.run(
-        [
-            "algokit",
-            "--no-color",
-            "compile",
-            "python",
-            contract_path.absolute(),
-            f"--out-dir={output_dir}",
-            "--output-arc32",
-            "--debug-level=0",
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
+def has_in_process_backend() -> bool:
+    """Checks whether puyapy and the client generator can be imported in-process."""
+    return (
+        find_spec("puyapy") is not None
+        and find_spec("algokit_client_generator") is not None
     )
-    if build_result.returncode:
-        raise Exception(f"Could not build contract:\n{build_result.stdout}")
 
-    app_spec_file_names = [file.name for file in output_dir.glob("*.arc32.json")]
 
-    for app_spec_file_name in app_spec_file_names:
-        if app_spec_file_name is None:
-            raise Exception(
-                "Could not generate typed client, .arc32.json file not found"
+class _Flushable(typing.Protocol):
+    def flush(self) -> None: ...
+
+
+class _InProcessBackend:
+    """
+    puyapy and the client generator, imported once and reused for every build.
+
+    Each `algokit` subprocess pays interpreter start-up and compiler import cost;
+    keeping the loaded modules around skips both for every contract after the first.
+    """
+
+    def __init__(self) -> None:
+        import puyapy.parse
+        from algokit_client_generator import generate_client
+        from puya.log import LogLevel, configure_logging
+        from puyapy.compile import compile_to_teal
+        from puyapy.options import PuyaPyOptions
+
+        configure_logging(min_log_level=LogLevel.warning)
+        self._parse = puyapy.parse
+        self._compile_to_teal = compile_to_teal
+        self._options = PuyaPyOptions
+        self.generate_client = generate_client
+
+    def compile(self, contract_path: Path, output_dir: Path) -> None:
+        # puyapy caches source files for the lifetime of the process, which would
+        # hand stale sources to a long-lived worker
+        fscache: _Flushable | None = getattr(self._parse, "_MYPY_FSCACHE", None)
+        if fscache is not None:
+            fscache.flush()
+        try:
+            self._compile_to_teal(
+                self._options(
+                    paths=[contract_path.absolute()],
+                    out_dir=output_dir,
+                    output_teal=True,
+                    output_arc32=True,
+                    debug_level=0,
+                )
             )
-        print(app_spec_file_name)
-        generate_result = subprocess.run(
+        except SystemExit as ex:
+            raise Exception(f"Could not build contract {contract_path}") from ex
+
+
+_backend: _InProcessBackend | None = None
+
+
+def _in_process_backend() -> _InProcessBackend:
+    global _backend
+    if _backend is None:
+        _backend = _InProcessBackend()
+    return _backend
+
+
+def build_in_process(output_dir: Path, contract_path: Path) -> Path:
+    """Same as `build`, running the compiler and client generator in this process."""
+    contract_name = contract_path.parent.name
+    with metrics.phase("load_compiler"):
+        backend = _in_process_backend()
+    output_dir = _prepare_output_dir(output_dir, contract_path)
+    with metrics.phase("compile", contract_name):
+        backend.compile(contract_path, output_dir)
+
+    app_spec_paths = sorted(output_dir.glob("*.arc32.json"))
+    if not app_spec_paths:
+        raise Exception("Could not generate typed client, .arc32.json file not found")
+    with metrics.phase("generate_client", contract_name):
+        for app_spec_path in app_spec_paths:
+            app_name = app_spec_path.name.removesuffix(".arc32.json")
+            backend.generate_client(
+                app_spec_path, output_dir / f"{_snake_case(app_name)}_client.py"
+            )
+
+    return app_spec_paths[-1]
+
+
+def build(output_dir: Path, contract_path: Path) -> Path:
+    contract_name = contract_path.parent.name
+    output_dir = _prepare_output_dir(output_dir, contract_path)
+
+    with metrics.phase("compile", contract_name):
+        build_result = metrics.run(
             [
                 "algokit",
-                "generate",
-                "client",
-                output_dir,
-                "--output",
-                _get_output_path(output_dir, deployment_extension),
+                "--no-color",
+                "compile",
+                "python",
+                contract_path.absolute(),
+                f"--out-dir={output_dir}",
+                "--output-arc32",
+                "--debug-level=0",
             ],
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            text=True,
         )
-        if generate_result.returncode:
-            if "No such command" in generate_result.stdout:
-                raise Exception(
-                    "Could not generate typed client, requires AlgoKit 2.0.0 or "
-                    "later. Please update AlgoKit"
-                )
-            else:
-                raise Exception(
-                    f"Could not generate typed client:\n{generate_result.stdout}"
-                )
+        if build_result.returncode:
+            raise Exception(f"Could not build contract:\n{build_result.stdout}")
+
+    app_spec_file_names = [file.name for file in output_dir.glob("*.arc32.json")]
+
+    for app_spec_file_name in app_spec_file_names:
+        if app_spec_file_name is None:
+            raise Exception(
+                "Could not generate typed client, .arc32.json file not found"
+            )
+        print(app_spec_file_name)
+        with metrics.phase("generate_client", contract_name):
+            generate_result = metrics.run(
+                [
+                    "algokit",
+                    "generate",
+                    "client",
+                    output_dir,
+                    "--output",
+                    _get_output_path(output_dir, deployment_extension),
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+            if generate_result.returncode:
+                if "No such command" in generate_result.stdout:
+                    raise Exception(
+                        "Could not generate typed client, requires AlgoKit 2.0.0 or "
+                        "later. Please update AlgoKit"
+                    )
+                else:
+                    raise Exception(
+                        f"Could not generate typed client:\n{generate_result.stdout}"
+                    )
 
     return output_dir / app_spec_file_name
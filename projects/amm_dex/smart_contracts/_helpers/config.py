@@ -7,6 +7,8 @@ from algokit_utils import Account, ApplicationSpecification
 from algosdk.v2client.algod import AlgodClient
 from algosdk.v2client.indexer import IndexerClient
 
+from smart_contracts._helpers.metrics import metrics
+
 
 @dataclasses.dataclass
 class SmartContract:
@@ -50,12 +52,13 @@ def has_contract_file(directory: Path) -> bool:
 
 # define contracts to build and/or deploy
 base_dir = Path("smart_contracts")
-contracts = [
-    SmartContract(
-        path=import_contract(folder),
-        name=folder.name,
-        deploy=import_deploy_if_exists(folder),
-    )
-    for folder in base_dir.iterdir()
-    if folder.is_dir() and has_contract_file(folder)
-]
+with metrics.phase("discover"):
+    contracts = [
+        SmartContract(
+            path=import_contract(folder),
+            name=folder.name,
+            deploy=import_deploy_if_exists(folder),
+        )
+        for folder in base_dir.iterdir()
+        if folder.is_dir() and has_contract_file(folder)
+    ]
@@ -18,6 +18,8 @@ from algosdk.util import algos_to_microalgos
 from algosdk.v2client.algod import AlgodClient
 from algosdk.v2client.indexer import IndexerClient
 
+from smart_contracts._helpers.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,24 +32,29 @@ def deploy(
 ) -> None:
     # get clients
     # by default client configuration is loaded from environment variables
-    algod_client = get_algod_client()
+    # requests made through algod_client are timed by metrics
+    algod_client = metrics.instrument_algod(get_algod_client())
     indexer_client = get_indexer_client()
+    contract_name = app_spec_path.parent.name
 
     # get app spec
-    app_spec = ApplicationSpecification.from_json(app_spec_path.read_text())
-
-    # get deployer account by name
-    deployer = get_account(algod_client, "DEPLOYER", fund_with_algos=0)
-
-    minimum_funds_micro_algos = algos_to_microalgos(deployer_initial_funds)
-    ensure_funded(
-        algod_client,
-        EnsureBalanceParameters(
-            account_to_fund=deployer,
-            min_spending_balance_micro_algos=minimum_funds_micro_algos,
-            min_funding_increment_micro_algos=minimum_funds_micro_algos,
-        ),
-    )
+    with metrics.phase("parse_app_spec", contract_name):
+        app_spec = ApplicationSpecification.from_json(app_spec_path.read_text())
+
+    with metrics.phase("fund", contract_name):
+        # get deployer account by name
+        deployer = get_account(algod_client, "DEPLOYER", fund_with_algos=0)
+
+        minimum_funds_micro_algos = algos_to_microalgos(deployer_initial_funds)
+        ensure_funded(
+            algod_client,
+            EnsureBalanceParameters(
+                account_to_fund=deployer,
+                min_spending_balance_micro_algos=minimum_funds_micro_algos,
+                min_funding_increment_micro_algos=minimum_funds_micro_algos,
+            ),
+        )
 
     # use provided callback to deploy the app
-    deploy_callback(algod_client, indexer_client, app_spec, deployer)
+    with metrics.phase("deploy", contract_name):
+        deploy_callback(algod_client, indexer_client, app_spec, deployer)
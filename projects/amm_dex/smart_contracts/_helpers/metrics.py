@@ -0,0 +1,314 @@
+"""
+Phase timings and algod call statistics for the smart_contracts CLI.
+
+Every phase of a run (contract discovery, compile, client generation, app spec
+parsing, funding, deploy) is wrapped in `metrics.phase(...)`, and so is the run
+as a whole, which fails if anything in it raises. Time spent in subprocesses and
+in algod requests is attributed to the innermost open phase, including requests
+made from worker threads while that phase is open.
+
+At the end of a run the collected records are written as a JSON report and,
+optionally, as a Prometheus text-format file for a node exporter textfile
+collector to pick up.
+"""
+
+import contextlib
+import dataclasses
+import json
+import logging
+import re
+import subprocess
+import threading
+import time
+import typing
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+from algosdk.v2client.algod import AlgodClient, AlgodResponseType, ParamsType
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "smart_contracts"
+# path segments that identify a specific app, asset, round or transaction
+_ID_SEGMENT = re.compile(r"^(\d+|[A-Z2-7]{52}|[A-Z2-7]{58})$")
+
+
+@dataclasses.dataclass
+class AlgodCalls:
+    count: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclasses.dataclass
+class PhaseRecord:
+    name: str
+    contract: str | None
+    # seconds since the collector was created
+    started: float
+    seconds: float = 0.0
+    subprocess_seconds: float = 0.0
+    ok: bool = True
+    algod: dict[str, AlgodCalls] = dataclasses.field(default_factory=dict)
+
+
+class AlgodCallsReport(typing.TypedDict):
+    count: int
+    errors: int
+    seconds: float
+    max_seconds: float
+
+
+class PhaseReport(typing.TypedDict):
+    name: str
+    contract: str | None
+    started: float
+    seconds: float
+    subprocess_seconds: float
+    ok: bool
+    algod: dict[str, AlgodCallsReport]
+
+
+class Report(typing.TypedDict):
+    started_at: float
+    seconds: float
+    ok: bool
+    phases: list[PhaseReport]
+
+
+def _endpoint(method: str, requrl: str) -> str:
+    path = requrl.split("?", 1)[0]
+    segments = ["{id}" if _ID_SEGMENT.match(s) else s for s in path.split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str | None) -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in labels.items() if v is not None]
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._created = time.perf_counter()
+        self.started_at = time.time()
+        self.phases: list[PhaseRecord] = []
+        self._open: list[PhaseRecord] = []
+        self._lock = threading.Lock()
+        # algod calls made while no phase is open
+        self._unattributed = PhaseRecord(name="none", contract=None, started=0.0)
+
+    def _current(self) -> PhaseRecord:
+        return self._open[-1] if self._open else self._unattributed
+
+    @contextlib.contextmanager
+    def phase(self, name: str, contract: str | None = None) -> Iterator[PhaseRecord]:
+        """Records the wall-clock duration and outcome of the enclosed block."""
+        started = time.perf_counter()
+        record = PhaseRecord(name, contract, started=started - self._created)
+        with self._lock:
+            self.phases.append(record)
+            self._open.append(record)
+        try:
+            yield record
+        except BaseException:
+            record.ok = False
+            raise
+        finally:
+            record.seconds = time.perf_counter() - started
+            with self._lock:
+                self._open.remove(record)
+            logger.debug(
+                f"{name}{f' {contract}' if contract else ''} took {record.seconds:.3f}s"
+            )
+
+    def run(
+        self,
+        args: Sequence[str | Path],
+        *,
+        check: bool = False,
+        stdout: int | None = None,
+        stderr: int | None = None,
+    ) -> "subprocess.CompletedProcess[str]":
+        """`subprocess.run` in text mode, adding its duration to the current phase."""
+        started = time.perf_counter()
+        try:
+            return subprocess.run(
+                args, check=check, stdout=stdout, stderr=stderr, text=True
+            )
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._current().subprocess_seconds += elapsed
+
+    def _record_algod(self, endpoint: str, seconds: float, *, ok: bool) -> None:
+        with self._lock:
+            calls = self._current().algod.setdefault(endpoint, AlgodCalls())
+            calls.count += 1
+            calls.errors += not ok
+            calls.seconds += seconds
+            calls.max_seconds = max(calls.max_seconds, seconds)
+
+    def instrument_algod(self, algod_client: AlgodClient) -> AlgodClient:
+        """Times every request `algod_client` makes; returns the same client."""
+        request = algod_client.algod_request
+
+        def timed_request(
+            method: str,
+            requrl: str,
+            params: ParamsType | None = None,
+            data: bytes | None = None,
+            headers: dict[str, str] | None = None,
+            response_format: str | None = "json",
+            timeout: int | None = 30,
+        ) -> AlgodResponseType:
+            started = time.perf_counter()
+            ok = False
+            try:
+                response = request(
+                    method,
+                    requrl,
+                    params=params,
+                    data=data,
+                    headers=headers,
+                    response_format=response_format,
+                    timeout=timeout,
+                )
+                ok = True
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                self._record_algod(_endpoint(method, requrl), elapsed, ok=ok)
+
+        algod_client.algod_request = timed_request  # type: ignore[method-assign]
+        return algod_client
+
+    def report(self) -> Report:
+        with self._lock:
+            phases = [*self.phases]
+            if self._unattributed.algod:
+                phases.append(self._unattributed)
+            return {
+                "started_at": self.started_at,
+                "seconds": time.perf_counter() - self._created,
+                "ok": all(p.ok for p in phases),
+                "phases": [
+                    typing.cast(PhaseReport, dataclasses.asdict(p)) for p in phases
+                ],
+            }
+
+    def prometheus(self) -> str:
+        """The report in Prometheus text exposition format, one series per phase."""
+        report = self.report()
+        # a phase can run more than once (e.g. watch mode), so series are summed
+        durations: dict[str, float] = {}
+        subprocesses: dict[str, float] = {}
+        failures: dict[str, int] = {}
+        algod: dict[str, AlgodCalls] = {}
+        for phase in report["phases"]:
+            labels = _labels(phase=phase["name"], contract=phase["contract"])
+            durations[labels] = durations.get(labels, 0.0) + phase["seconds"]
+            subprocesses[labels] = (
+                subprocesses.get(labels, 0.0) + phase["subprocess_seconds"]
+            )
+            failures[labels] = failures.get(labels, 0) + (not phase["ok"])
+            for endpoint, calls in phase["algod"].items():
+                key = _labels(
+                    phase=phase["name"], contract=phase["contract"], endpoint=endpoint
+                )
+                total = algod.setdefault(key, AlgodCalls())
+                total.count += calls["count"]
+                total.errors += calls["errors"]
+                total.seconds += calls["seconds"]
+                total.max_seconds = max(total.max_seconds, calls["max_seconds"])
+
+        series: list[tuple[str, str, str, dict[str, float]]] = [
+            (
+                "run_timestamp_seconds",
+                "gauge",
+                "Unix time the run started.",
+                {"": report["started_at"]},
+            ),
+            (
+                "run_seconds",
+                "gauge",
+                "Wall-clock duration of the whole run.",
+                {"": report["seconds"]},
+            ),
+            (
+                "run_success",
+                "gauge",
+                "1 if every phase of the run succeeded.",
+                {"": float(report["ok"])},
+            ),
+            (
+                "phase_seconds",
+                "gauge",
+                "Wall-clock time spent in each phase.",
+                durations,
+            ),
+            (
+                "phase_subprocess_seconds",
+                "gauge",
+                "Wall-clock time spent waiting on subprocesses in each phase.",
+                subprocesses,
+            ),
+            (
+                "phase_failures",
+                "gauge",
+                "Number of times each phase failed.",
+                {k: float(v) for k, v in failures.items()},
+            ),
+            (
+                "algod_requests",
+                "gauge",
+                "Number of algod requests made.",
+                {k: float(v.count) for k, v in algod.items()},
+            ),
+            (
+                "algod_request_errors",
+                "gauge",
+                "Number of algod requests that failed.",
+                {k: float(v.errors) for k, v in algod.items()},
+            ),
+            (
+                "algod_request_seconds",
+                "gauge",
+                "Total time spent in algod requests.",
+                {k: v.seconds for k, v in algod.items()},
+            ),
+            (
+                "algod_request_max_seconds",
+                "gauge",
+                "Slowest single algod request.",
+                {k: v.max_seconds for k, v in algod.items()},
+            ),
+        ]
+        lines = []
+        for name, kind, help_text, values in series:
+            if not values:
+                continue
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            lines += [f"{METRIC_PREFIX}_{name}{k} {v!r}" for k, v in values.items()]
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: Path, prometheus_path: Path | None = None) -> None:
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        json_path.write_text(json.dumps(self.report(), indent=2))
+        logger.info(f"Wrote metrics report to {json_path}")
+        if prometheus_path is not None:
+            prometheus_path.parent.mkdir(parents=True, exist_ok=True)
+            # write then rename, so a textfile collector never reads a partial file
+            tmp_path = prometheus_path.with_suffix(prometheus_path.suffix + ".tmp")
+            tmp_path.write_text(self.prometheus())
+            tmp_path.replace(prometheus_path)
+            logger.info(f"Wrote Prometheus metrics to {prometheus_path}")
+
+
+# collector for the current CLI run
+metrics = Metrics()
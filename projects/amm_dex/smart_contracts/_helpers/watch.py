@@ -0,0 +1,52 @@
+import logging
+import time
+from pathlib import Path
+
+from smart_contracts._helpers.build import build_in_process, has_in_process_backend
+from smart_contracts._helpers.config import SmartContract
+
+logger = logging.getLogger(__name__)
+
+
+def _mtime(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def watch(
+    contracts: list[SmartContract], artifact_path: Path, interval: float = 0.2
+) -> None:
+    """
+    Rebuilds a contract every time its contract.py is saved, until interrupted.
+
+    The compiler is loaded once by the first build and reused for every rebuild.
+    """
+    if not has_in_process_backend():
+        raise Exception(
+            "Watch mode compiles in-process and requires puyapy and "
+            "algokit-client-generator, install them with `poetry install`"
+        )
+    mtimes = {contract.name: _mtime(contract.path) for contract in contracts}
+    for contract in contracts:
+        _rebuild(contract, artifact_path)
+    logger.info(f"Watching {', '.join(str(c.path) for c in contracts)}")
+    while True:
+        time.sleep(interval)
+        for contract in contracts:
+            mtime = _mtime(contract.path)
+            if mtime != mtimes[contract.name]:
+                mtimes[contract.name] = mtime
+                _rebuild(contract, artifact_path)
+
+
+def _rebuild(contract: SmartContract, artifact_path: Path) -> None:
+    started = time.perf_counter()
+    try:
+        build_in_process(artifact_path / contract.name, contract.path)
+    except Exception:
+        logger.exception(f"Could not build {contract.path}")
+    else:
+        elapsed = time.perf_counter() - started
+        logger.info(f"Built {contract.name} in {elapsed:.2f}s")
@@ -0,0 +1,364 @@
+"""
+Finds profitable swap cycles across ConstantProductAMM pools that share assets.
+
+Pools are edges of a graph whose nodes are assets. Crossing a pool from asset X
+to asset Y has the marginal rate `FACTOR / SCALE * reserve_y / reserve_x`, and a
+cycle of swaps is profitable for small inputs exactly when the sum of the log
+rates along it is positive. Only cycles of two pools (the same pair in two
+pools) and three pools (a triangle of assets) are considered, which bounds the
+work per pool by the number of pools around its two assets.
+
+Every swap `x -> a*x / (b + c*x)` is a Möbius map and so is any chain of them,
+which gives the input that maximises `f(x) - x` for a whole cycle in closed
+form: `x = (sqrt(a*b) - b) / c`. The coefficients are kept as integers, and the
+candidate inputs are then replayed through `pool_math.tokens_to_swap` so the
+reported amounts are exactly what the contracts will pay out.
+
+The scanner caches the reserves of every pool it is given. `update` re-evaluates
+only the cycles through the pools that changed; `scan` evaluates every cycle.
+"""
+
+import concurrent.futures
+import copy
+import dataclasses
+import math
+from collections.abc import Iterable, Sequence
+
+import algokit_utils
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    TransactionWithSigner,
+)
+from algosdk.logic import get_application_address
+from algosdk.transaction import AssetTransferTxn, SuggestedParams
+from algosdk.v2client.algod import AlgodClient
+
+from smart_contracts.amm_dex import pool_math
+from smart_contracts.amm_dex.lean_client import PoolMetadata
+
+# (app ID, asset sent in) for each swap of a cycle
+Cycle = tuple[tuple[int, int], ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolReserves:
+    app_id: int
+    asset_a: int
+    asset_b: int
+    reserve_a: int
+    reserve_b: int
+
+    def other(self, asset: int) -> int:
+        return self.asset_b if asset == self.asset_a else self.asset_a
+
+    def reserves(self, in_asset: int) -> tuple[int, int]:
+        """(in reserve, out reserve) for a swap sending `in_asset`."""
+        if in_asset == self.asset_a:
+            return self.reserve_a, self.reserve_b
+        return self.reserve_b, self.reserve_a
+
+
+@dataclasses.dataclass(frozen=True)
+class Hop:
+    app_id: int
+    in_asset: int
+    out_asset: int
+    amount_in: int
+    amount_out: int
+
+
+@dataclasses.dataclass(frozen=True)
+class Opportunity:
+    hops: tuple[Hop, ...]
+
+    @property
+    def asset(self) -> int:
+        """The asset the cycle starts and ends in, which the profit is paid in."""
+        return self.hops[0].in_asset
+
+    @property
+    def amount_in(self) -> int:
+        return self.hops[0].amount_in
+
+    @property
+    def amount_out(self) -> int:
+        return self.hops[-1].amount_out
+
+    @property
+    def profit(self) -> int:
+        return self.amount_out - self.amount_in
+
+
+def _canonical(cycle: Cycle) -> Cycle:
+    start = cycle.index(min(cycle))
+    return cycle[start:] + cycle[:start]
+
+
+class ArbitrageScanner:
+    """
+    Cached reserves of many pools, and the profitable cycles between them.
+
+    `base_assets` restricts the assets a cycle may start in, i.e. the assets the
+    trader holds and wants the profit paid in. By default a cycle starts in its
+    lowest asset ID.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_assets: Iterable[int] | None = None,
+        min_profit: int = 1,
+        scale: int = pool_math.SCALE,
+        fee: int = pool_math.FEE,
+    ) -> None:
+        self.base_assets = None if base_assets is None else frozenset(base_assets)
+        self.min_profit = min_profit
+        self.scale = scale
+        self.factor = scale - fee
+        self.pools: dict[int, PoolReserves] = {}
+        # asset -> neighbouring asset -> app IDs of the pools trading the pair
+        self._pairs: dict[int, dict[int, set[int]]] = {}
+        # (app ID, asset sent in) -> log of the marginal rate
+        self._log_rates: dict[tuple[int, int], float] = {}
+        # (asset sent in, asset paid out) -> best log rate over the pools of the pair
+        self._best: dict[tuple[int, int], float] = {}
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+    def update(self, pools: Iterable[PoolReserves]) -> list[Opportunity]:
+        """Caches new reserves, returning the opportunities through those pools."""
+        changed = []
+        for pool in pools:
+            self._remove(pool.app_id)
+            self._add(pool)
+            changed.append(pool.app_id)
+        return self._evaluate(self._cycles_through(changed))
+
+    def remove(self, app_id: int) -> None:
+        self._remove(app_id)
+
+    def scan(self) -> list[Opportunity]:
+        """Every profitable cycle among the cached pools."""
+        return self._evaluate(self._cycles_through(self.pools))
+
+    def _add(self, pool: PoolReserves) -> None:
+        self.pools[pool.app_id] = pool
+        a, b = pool.asset_a, pool.asset_b
+        self._pairs.setdefault(a, {}).setdefault(b, set()).add(pool.app_id)
+        self._pairs.setdefault(b, {}).setdefault(a, set()).add(pool.app_id)
+        for in_asset in (a, b):
+            in_reserve, out_reserve = pool.reserves(in_asset)
+            self._log_rates[(pool.app_id, in_asset)] = (
+                math.log(self.factor * out_reserve / (self.scale * in_reserve))
+                if in_reserve and out_reserve
+                else -math.inf
+            )
+        self._update_best(a, b)
+
+    def _remove(self, app_id: int) -> None:
+        pool = self.pools.pop(app_id, None)
+        if pool is None:
+            return
+        for x, y in ((pool.asset_a, pool.asset_b), (pool.asset_b, pool.asset_a)):
+            app_ids = self._pairs[x][y]
+            app_ids.discard(app_id)
+            if not app_ids:
+                del self._pairs[x][y]
+            self._log_rates.pop((app_id, x), None)
+        self._update_best(pool.asset_a, pool.asset_b)
+
+    def _update_best(self, a: int, b: int) -> None:
+        app_ids = self._pairs[a].get(b, ())
+        for x, y in ((a, b), (b, a)):
+            if app_ids:
+                self._best[(x, y)] = max(self._log_rates[(i, x)] for i in app_ids)
+            else:
+                self._best.pop((x, y), None)
+
+    def _cycles_through(self, app_ids: Iterable[int]) -> set[Cycle]:
+        """
+        Cycles of 2 and 3 pools through any of `app_ids` with a positive log gain.
+
+        A cycle through several of `app_ids` is only collected from the lowest of
+        them, and asset triangles are skipped without visiting their pools when
+        even the best rate on each side cannot close the cycle at a gain.
+        """
+        changed = set(app_ids)
+        log_rates, best = self._log_rates, self._best
+        cycles = set()
+        for app_id in changed:
+            pool = self.pools[app_id]
+            x, y = pool.asset_a, pool.asset_b
+            x_pairs, y_pairs = self._pairs[x], self._pairs[y]
+            forward, backward = log_rates[(app_id, x)], log_rates[(app_id, y)]
+            for other in x_pairs[y]:
+                if other == app_id or (other in changed and other < app_id):
+                    continue
+                if forward + log_rates[(other, y)] > 0:
+                    cycles.add(_canonical(((app_id, x), (other, y))))
+                if backward + log_rates[(other, x)] > 0:
+                    cycles.add(_canonical(((app_id, y), (other, x))))
+            for z in x_pairs.keys() & y_pairs.keys():
+                if (
+                    forward + best[(y, z)] + best[(z, x)] <= 0
+                    and backward + best[(x, z)] + best[(z, y)] <= 0
+                ):
+                    continue
+                for y_z in y_pairs[z]:
+                    if y_z in changed and y_z < app_id:
+                        continue
+                    y_to_z, z_to_y = log_rates[(y_z, y)], log_rates[(y_z, z)]
+                    for z_x in self._pairs[z][x]:
+                        if z_x in changed and z_x < app_id:
+                            continue
+                        if forward + y_to_z + log_rates[(z_x, z)] > 0:
+                            cycles.add(_canonical(((app_id, x), (y_z, y), (z_x, z))))
+                        if log_rates[(z_x, x)] + z_to_y + backward > 0:
+                            cycles.add(_canonical(((z_x, x), (y_z, z), (app_id, y))))
+        return cycles
+
+    def _evaluate(self, cycles: Iterable[Cycle]) -> list[Opportunity]:
+        opportunities = []
+        for cycle in cycles:
+            opportunity = self._optimise(cycle)
+            if opportunity is not None and opportunity.profit >= self.min_profit:
+                opportunities.append(opportunity)
+        return sorted(opportunities, key=lambda o: o.profit, reverse=True)
+
+    def _start(self, cycle: Cycle) -> Cycle | None:
+        """Rotates the cycle to start in a base asset, if it passes through one."""
+        starts = [
+            i
+            for i, (_, in_asset) in enumerate(cycle)
+            if self.base_assets is None or in_asset in self.base_assets
+        ]
+        if not starts:
+            return None
+        start = min(starts, key=lambda i: cycle[i][1])
+        return cycle[start:] + cycle[:start]
+
+    def _optimise(self, cycle: Cycle) -> Opportunity | None:
+        rotated = self._start(cycle)
+        if rotated is None:
+            return None
+        # compose x -> a*x / (b + c*x) over every hop, in integers
+        a, b, c = 1, 1, 0
+        for app_id, in_asset in rotated:
+            in_reserve, out_reserve = self.pools[app_id].reserves(in_asset)
+            hop_a, hop_b = self.factor * out_reserve, self.scale * in_reserve
+            a, b, c = hop_a * a, hop_b * b, hop_b * c + self.factor * a
+        if a <= b:
+            return None
+        optimum = (math.isqrt(a * b) - b) // c
+        # flooring at each hop leaves the integer profit near the real optimum within
+        # about one unit per hop of the best integer input
+        candidates = [
+            self._replay(rotated, amount)
+            for amount in range(max(optimum - 1, 1), optimum + 2)
+        ]
+        return max(
+            (o for o in candidates if o is not None),
+            key=lambda o: o.profit,
+            default=None,
+        )
+
+    def _replay(self, cycle: Cycle, amount: int) -> Opportunity | None:
+        """Runs `amount` through the cycle with the contract's integer math."""
+        hops = []
+        for app_id, in_asset in cycle:
+            pool = self.pools[app_id]
+            in_reserve, out_reserve = pool.reserves(in_asset)
+            try:
+                amount_out = pool_math.tokens_to_swap(
+                    in_amount=amount,
+                    in_supply=pool_math.uint64(in_reserve + amount),
+                    out_supply=out_reserve,
+                    scale=self.scale,
+                    fee=self.scale - self.factor,
+                )
+            except ArithmeticError:
+                return None
+            if amount_out == 0:
+                return None
+            hops.append(Hop(app_id, in_asset, pool.other(in_asset), amount, amount_out))
+            amount = amount_out
+        return Opportunity(tuple(hops))
+
+
+def fetch_reserves(algod_client: AlgodClient, metadata: PoolMetadata) -> PoolReserves:
+    """Reads the current reserves of a pool from its app account."""
+    account = algod_client.account_info(get_application_address(metadata.app_id))
+    assert isinstance(account, dict)
+    balances = {
+        holding["asset-id"]: holding["amount"] for holding in account.get("assets", [])
+    }
+    return PoolReserves(
+        app_id=metadata.app_id,
+        asset_a=metadata.asset_a,
+        asset_b=metadata.asset_b,
+        reserve_a=balances.get(metadata.asset_a, 0),
+        reserve_b=balances.get(metadata.asset_b, 0),
+    )
+
+
+def fetch_all_reserves(
+    algod_client: AlgodClient, pools: Sequence[PoolMetadata], max_workers: int = 16
+) -> list[PoolReserves]:
+    """`fetch_reserves` for many pools, with requests made concurrently."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return list(
+            executor.map(lambda pool: fetch_reserves(algod_client, pool), pools)
+        )
+
+
+def compose_cycle(
+    algod_client: AlgodClient,
+    trader: algokit_utils.Account,
+    opportunity: Opportunity,
+    *,
+    suggested_params: SuggestedParams | None = None,
+    expires_at: int = 0,
+    atc: AtomicTransactionComposer | None = None,
+) -> AtomicTransactionComposer:
+    """
+    Adds the swaps of `opportunity` to a single atomic group.
+
+    Each swap passes the exact output expected from the cached reserves as
+    `min_out`, so if any pool has moved since, the whole group is rejected
+    instead of executing part of the cycle at a worse price.
+    """
+    from smart_contracts.artifacts.amm_dex.constant_product_amm_client import (
+        ConstantProductAmmClient,
+    )
+
+    atc = atc or AtomicTransactionComposer()
+    params = suggested_params or algod_client.suggested_params()
+    # swap_lean sends its output in a zero fee inner transaction
+    call_params = copy.copy(params)
+    call_params.flat_fee = True
+    call_params.fee = params.min_fee * 2
+    for hop in opportunity.hops:
+        client = ConstantProductAmmClient(
+            algod_client, app_id=hop.app_id, signer=trader
+        )
+        swap_xfer = TransactionWithSigner(
+            AssetTransferTxn(
+                trader.address,
+                params,
+                get_application_address(hop.app_id),
+                hop.amount_in,
+                hop.in_asset,
+            ),
+            trader.signer,
+        )
+        client.compose(atc).swap_lean(
+            swap_xfer=swap_xfer,
+            min_out=hop.amount_out,
+            max_price_impact_bps=pool_math.BPS,
+            expires_at=expires_at,
+            transaction_parameters=algokit_utils.TransactionParameters(
+                suggested_params=call_params, foreign_assets=[hop.out_asset]
+            ),
+        )
+    return atc
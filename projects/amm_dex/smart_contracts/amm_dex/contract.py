@@ -1,4 +1,4 @@
-from algopy import Account, ARC4Contract, Asset, Global, Txn, UInt64, arc4, gtxn, itxn, op, subroutine
+from algopy import Account, ARC4Contract, Asset, BigUInt, BoxMap, Global, Txn, UInt64, arc4, gtxn, itxn, op, subroutine
 
 # Total supply of the pool tokens
 TOTAL_SUPPLY = 10_000_000_000
@@ -8,6 +8,24 @@ SCALE = 1000
 # Fee for swaps, 5 represents 0.5% ((fee / scale)*100)
 FEE = 5
 FACTOR = SCALE - FEE
+# Basis points, đơn vị của max_price_impact_bps (10_000 = 100%)
+BPS = 10_000
+# Tiền tố của box lưu vị thế LP, tên box là tiền tố + địa chỉ tài khoản (32 byte)
+POSITION_BOX_PREFIX = b"p"
+# Số dư tối thiểu cho một box vị thế: 2_500 + 400 * (độ dài tên + độ dài giá trị)
+POSITION_MBR = 2_500 + 400 * (1 + 32 + 48)
+
+
+class Position(arc4.Struct):
+    """Tổng cộng dồn các khoản nạp và rút của một nhà cung cấp thanh khoản"""
+
+    a_deposited: arc4.UInt64
+    b_deposited: arc4.UInt64
+    lp_minted: arc4.UInt64
+    a_withdrawn: arc4.UInt64
+    b_withdrawn: arc4.UInt64
+    lp_burned: arc4.UInt64
+
 
 class ConstantProductAMM(ARC4Contract):
     def __init__(self) -> None:
@@ -23,6 +41,8 @@ class ConstantProductAMM(ARC4Contract):
         self.pool_token = Asset()
         # Tỷ lệ giữa các tài sản (A*Scale/B)
         self.ratio = UInt64(0)
+        # Vị thế LP của các tài khoản đã mở box bằng open_position
+        self.positions = BoxMap(Account, Position, key_prefix=POSITION_BOX_PREFIX)
 
     @arc4.abimethod()
     def set_governor(self, new_governor: Account) -> None:
@@ -99,6 +119,10 @@ class ConstantProductAMM(ARC4Contract):
             pool_asset: ID của pool token, để chúng ta có thể phân phối nó.
             a_asset: ID của asset A, để chúng ta có thể kiểm tra số dư.
             b_asset: ID của asset B, để chúng ta có thể kiểm tra số dư.
+
+        Lưu ý:
+            - Client cần tham chiếu box vị thế của người gọi (POSITION_BOX_PREFIX + địa chỉ),
+              kể cả khi box chưa được mở, vì khoản nạp được ghi vào box đó.
         """
         self._check_bootstrapped()
 
@@ -106,6 +130,35 @@ class ConstantProductAMM(ARC4Contract):
         assert pool_asset == self.pool_token, "asset pool incorrect"
         assert a_asset == self.asset_a, "asset a incorrect"
         assert b_asset == self.asset_b, "asset b incorrect"
+        self._mint(a_xfer, b_xfer)
+
+    @arc4.abimethod()
+    def mint_lean(
+        self,
+        a_xfer: gtxn.AssetTransferTransaction,
+        b_xfer: gtxn.AssetTransferTransaction,
+    ) -> None:
+        """
+        Giống `mint` nhưng không nhận pool_asset, a_asset, b_asset làm tham số ABI.
+
+        Các asset được lấy từ global state thay vì phải truyền vào rồi so sánh lại.
+        Asset A và B đã có sẵn trong nhóm nhờ a_xfer và b_xfer (group resource sharing),
+        client chỉ cần đưa pool token vào foreign assets. Như `mint`, client cũng cần
+        tham chiếu box vị thế của người gọi.
+
+        Các thông số đầu vào:
+            a_xfer: Giao dịch chuyển khoản asset A vào pool.
+            b_xfer: Giao dịch chuyển khoản asset B vào pool.
+        """
+        self._check_bootstrapped()
+        self._mint(a_xfer, b_xfer)
+
+    @subroutine
+    def _mint(
+        self,
+        a_xfer: gtxn.AssetTransferTransaction,
+        b_xfer: gtxn.AssetTransferTransaction,
+    ) -> None:
         assert a_xfer.sender == Txn.sender, "sender invalid"
         assert b_xfer.sender == Txn.sender, "sender invalid"
 
@@ -135,6 +188,14 @@ class ConstantProductAMM(ARC4Contract):
         # mint tokens
         do_asset_transfer(receiver=Txn.sender, asset=self.pool_token, amount=to_mint)
         self._update_ratio()
+        self._record_position(
+            a_deposited=a_xfer.asset_amount,
+            b_deposited=b_xfer.asset_amount,
+            lp_minted=to_mint,
+            a_withdrawn=UInt64(0),
+            b_withdrawn=UInt64(0),
+            lp_burned=UInt64(0),
+        )
 
     @arc4.abimethod(
         default_args={
@@ -164,13 +225,34 @@ class ConstantProductAMM(ARC4Contract):
             pool_asset: ID của pool token, để chúng ta có thể kiểm tra số dư.
             a_asset: ID của asset A, để chúng ta có thể kiểm tra số dư và phân phối nó.
             b_asset: ID của asset B, để chúng ta có thể kiểm tra số dư và phân phối nó.
+
+        Lưu ý:
+            - Client cần tham chiếu box vị thế của người gọi (POSITION_BOX_PREFIX + địa chỉ),
+              kể cả khi box chưa được mở, vì khoản rút được ghi vào box đó.
         """
         self._check_bootstrapped()
 
         assert pool_asset == self.pool_token, "asset pool incorrect"
         assert a_asset == self.asset_a, "asset a incorrect"
         assert b_asset == self.asset_b, "asset b incorrect"
+        self._burn(pool_xfer)
+
+    @arc4.abimethod()
+    def burn_lean(self, pool_xfer: gtxn.AssetTransferTransaction) -> None:
+        """
+        Giống `burn` nhưng không nhận pool_asset, a_asset, b_asset làm tham số ABI.
 
+        Pool token đã có sẵn trong nhóm nhờ pool_xfer, client chỉ cần đưa asset A và B
+        vào foreign assets. Như `burn`, client cũng cần tham chiếu box vị thế của người gọi.
+
+        Các thông số đầu vào:
+            pool_xfer: Giao dịch chuyển khoản pool token vào pool.
+        """
+        self._check_bootstrapped()
+        self._burn(pool_xfer)
+
+    @subroutine
+    def _burn(self, pool_xfer: gtxn.AssetTransferTransaction) -> None:
         assert (
             pool_xfer.asset_receiver == Global.current_application_address
         ), "receiver not app address"
@@ -198,6 +280,14 @@ class ConstantProductAMM(ARC4Contract):
         # Send back commensurate amt of b
         do_asset_transfer(receiver=Txn.sender, asset=self.asset_b, amount=b_amt)
         self._update_ratio()
+        self._record_position(
+            a_deposited=UInt64(0),
+            b_deposited=UInt64(0),
+            lp_minted=UInt64(0),
+            a_withdrawn=a_amt,
+            b_withdrawn=b_amt,
+            lp_burned=pool_xfer.asset_amount,
+        )
 
     @arc4.abimethod(
         default_args={
@@ -210,13 +300,18 @@ class ConstantProductAMM(ARC4Contract):
         swap_xfer: gtxn.AssetTransferTransaction,
         a_asset: Asset,
         b_asset: Asset,
-    ) -> None:
+        min_out: UInt64,
+        max_price_impact_bps: UInt64,
+        expires_at: UInt64,
+    ) -> UInt64:
         """
         Hàm này thực hiện swap (hoán đổi) một lượng asset A lấy asset B, hoặc ngược lại.
 
         Cách hoạt động:
         1. Người dùng gửi một lượng asset A hoặc asset B vào hợp đồng.
         2. Hợp đồng tính toán và trả lại một lượng tương ứng của asset còn lại.
+        3. Nếu tỷ lệ đã thay đổi quá giới hạn người dùng đặt ra thì giao dịch thất bại,
+           trước khi chuyển asset đầu ra.
 
         Các thông số đầu vào:
             swap_xfer: Giao dịch chuyển khoản của asset A hoặc asset B mà người dùng muốn swap.
@@ -226,24 +321,62 @@ class ConstantProductAMM(ARC4Contract):
             b_asset: ID của asset B, để chúng ta có thể:
                      - Kiểm tra số dư
                      - Chuyển khoản nếu cần (trong trường hợp người dùng swap A lấy B)
+            min_out: Số lượng asset đầu ra tối thiểu người dùng chấp nhận.
+            max_price_impact_bps: Mức chênh lệch tối đa (basis points) giữa giá thực hiện
+                     và giá hiện tại của pool (sau phí). Giá trị >= 10_000 tắt kiểm tra này.
+            expires_at: Round cuối cùng mà swap còn hiệu lực, 0 nghĩa là không hết hạn.
+
+        Kết quả trả về:
+            Số lượng asset đầu ra đã chuyển cho người dùng.
         """
         self._check_bootstrapped()
 
         assert a_asset == self.asset_a, "asset a incorrect"
         assert b_asset == self.asset_b, "asset b incorrect"
+        return self._swap(swap_xfer, min_out, max_price_impact_bps, expires_at)
+
+    @arc4.abimethod()
+    def swap_lean(
+        self,
+        swap_xfer: gtxn.AssetTransferTransaction,
+        min_out: UInt64,
+        max_price_impact_bps: UInt64,
+        expires_at: UInt64,
+    ) -> UInt64:
+        """
+        Giống `swap` nhưng không nhận a_asset, b_asset làm tham số ABI.
 
+        Asset được gửi vào đã có sẵn trong nhóm nhờ swap_xfer, client chỉ cần đưa
+        asset còn lại vào foreign assets.
+
+        Các thông số đầu vào:
+            swap_xfer: Giao dịch chuyển khoản asset A hoặc asset B mà người dùng muốn swap.
+            min_out, max_price_impact_bps, expires_at: giống `swap`.
+        """
+        self._check_bootstrapped()
+        return self._swap(swap_xfer, min_out, max_price_impact_bps, expires_at)
+
+    @subroutine
+    def _swap(
+        self,
+        swap_xfer: gtxn.AssetTransferTransaction,
+        min_out: UInt64,
+        max_price_impact_bps: UInt64,
+        expires_at: UInt64,
+    ) -> UInt64:
+        assert not expires_at or Global.round <= expires_at, "swap expired"
         assert swap_xfer.asset_amount > 0, "amount minimum not met"
         assert swap_xfer.sender == Txn.sender, "sender invalid"
 
         match swap_xfer.xfer_asset:
             case self.asset_a:
-                in_supply = self._current_b_balance()
-                out_supply = self._current_a_balance()
-                out_asset = self.asset_a
-            case self.asset_b:
                 in_supply = self._current_a_balance()
                 out_supply = self._current_b_balance()
                 out_asset = self.asset_b
+            case self.asset_b:
+                in_supply = self._current_b_balance()
+                out_supply = self._current_a_balance()
+                out_asset = self.asset_a
             case _:
                 assert False, "asset id incorrect"
 
@@ -251,9 +384,94 @@ class ConstantProductAMM(ARC4Contract):
             in_amount=swap_xfer.asset_amount, in_supply=in_supply, out_supply=out_supply
         )
         assert to_swap > 0, "send amount too low"
+        assert to_swap >= min_out, "output below minimum"
+        assert within_price_impact(
+            in_amount=swap_xfer.asset_amount,
+            in_supply=in_supply,
+            out_supply=out_supply,
+            out_amount=to_swap,
+            max_bps=max_price_impact_bps,
+        ), "price impact too high"
 
         do_asset_transfer(receiver=Txn.sender, asset=out_asset, amount=to_swap)
         self._update_ratio()
+        return to_swap
+
+    @arc4.abimethod()
+    def open_position(self, mbr_pay: gtxn.PaymentTransaction) -> None:
+        """
+        Mở box lưu vị thế LP cho người gọi. Việc này là tùy chọn: chỉ các tài khoản đã mở
+        box mới được ghi lại các khoản nạp và rút trong `mint`, `burn`, `mint_lean` và
+        `burn_lean`.
+
+        Lưu ý:
+            - Client cần tham chiếu box của người gọi (POSITION_BOX_PREFIX + địa chỉ)
+              trong mọi lệnh gọi `mint`, `burn`, `mint_lean` và `burn_lean`, kể cả khi
+              box chưa được mở.
+
+        Các thông số đầu vào:
+            mbr_pay: Khoản thanh toán vào tài khoản ứng dụng, ít nhất POSITION_MBR,
+                     để trả số dư tối thiểu cho box.
+        """
+        assert Txn.sender not in self.positions, "position already open"
+        assert mbr_pay.sender == Txn.sender, "sender invalid"
+        assert mbr_pay.receiver == Global.current_application_address, "receiver not app address"
+        assert mbr_pay.amount >= POSITION_MBR, "amount minimum not met"
+        zero = arc4.UInt64(0)
+        self.positions[Txn.sender] = Position(zero, zero, zero, zero, zero, zero)
+
+    @arc4.abimethod()
+    def close_position(self) -> None:
+        """
+        Xóa box vị thế LP của người gọi và hoàn lại POSITION_MBR cho người gọi.
+        """
+        assert Txn.sender in self.positions, "position not open"
+        del self.positions[Txn.sender]
+        itxn.Payment(receiver=Txn.sender, amount=POSITION_MBR).submit()
+
+    @arc4.abimethod(readonly=True)
+    def get_positions(
+        self, accounts: arc4.DynamicArray[arc4.Address]
+    ) -> arc4.DynamicArray[Position]:
+        """
+        Trả về vị thế LP của nhiều tài khoản trong một lệnh gọi, dùng qua simulate.
+
+        Tài khoản chưa mở box có vị thế bằng không.
+
+        Các thông số đầu vào:
+            accounts: Danh sách địa chỉ cần đọc vị thế.
+        """
+        zero = arc4.UInt64(0)
+        positions = arc4.DynamicArray[Position]()
+        for account in accounts:
+            if account.native in self.positions:
+                positions.append(self.positions[account.native].copy())
+            else:
+                positions.append(Position(zero, zero, zero, zero, zero, zero))
+        return positions
+
+    @subroutine
+    def _record_position(
+        self,
+        *,
+        a_deposited: UInt64,
+        b_deposited: UInt64,
+        lp_minted: UInt64,
+        a_withdrawn: UInt64,
+        b_withdrawn: UInt64,
+        lp_burned: UInt64,
+    ) -> None:
+        """Cộng dồn vào vị thế LP của người gọi, nếu người gọi đã mở box."""
+        if Txn.sender in self.positions:
+            position = self.positions[Txn.sender].copy()
+            self.positions[Txn.sender] = Position(
+                arc4.UInt64(position.a_deposited.native + a_deposited),
+                arc4.UInt64(position.b_deposited.native + b_deposited),
+                arc4.UInt64(position.lp_minted.native + lp_minted),
+                arc4.UInt64(position.a_withdrawn.native + a_withdrawn),
+                arc4.UInt64(position.b_withdrawn.native + b_withdrawn),
+                arc4.UInt64(position.lp_burned.native + lp_burned),
+            )
 
     @subroutine
     def _check_bootstrapped(self) -> None:
@@ -441,6 +659,47 @@ def tokens_to_swap(*, in_amount: UInt64, in_supply: UInt64, out_supply: UInt64)
     return out_total // in_total
 
 
+@subroutine
+def within_price_impact(
+    *,
+    in_amount: UInt64,
+    in_supply: UInt64,
+    out_supply: UInt64,
+    out_amount: UInt64,
+    max_bps: UInt64,
+) -> bool:
+    """
+    Kiểm tra mức trượt giá (price impact) của một swap có nằm trong giới hạn không.
+
+    Cách hoạt động:
+    1. Giá hiện tại của pool (sau phí) là FACTOR / SCALE * out_supply / (in_supply - in_amount)
+    2. Giá thực hiện là out_amount / in_amount
+    3. Price impact là phần giá thực hiện thấp hơn giá hiện tại, tính bằng basis points:
+       out_amount / in_amount >= giá hiện tại * (BPS - max_bps) / BPS
+
+    Tham số:
+    - in_amount: Số lượng token đầu vào
+    - in_supply: Số dư token đầu vào của pool, đã bao gồm in_amount
+    - out_supply: Số dư token đầu ra của pool
+    - out_amount: Số lượng token đầu ra, kết quả của tokens_to_swap
+    - max_bps: Price impact tối đa, >= BPS thì luôn hợp lệ
+
+    Lưu ý:
+    - Hai vế được nhân chéo với BigUInt để không bị overflow uint64
+    - Vì out_amount đã được làm tròn xuống, phần làm tròn cũng được tính vào price impact
+    """
+    if max_bps >= BPS:
+        return True
+    actual = BigUInt(out_amount) * BigUInt(in_supply - in_amount) * BigUInt(SCALE * BPS)
+    expected = (
+        BigUInt(in_amount)
+        * BigUInt(FACTOR)
+        * BigUInt(out_supply)
+        * BigUInt(BPS - max_bps)
+    )
+    return actual >= expected
+
+
 @subroutine
 def do_asset_transfer(*, receiver: Account, asset: Asset, amount: UInt64) -> None:
     """
@@ -1,4 +1,6 @@
 import logging
+import os
+from pathlib import Path
 
 import algokit_utils
 from algosdk.v2client.algod import AlgodClient
@@ -14,23 +16,39 @@ def deploy(
     app_spec: algokit_utils.ApplicationSpecification,
     deployer: algokit_utils.Account,
 ) -> None:
-    from smart_contracts.artifacts.amm_dex.amm_dex_client import (
-        AmmDexClient,
+    from smart_contracts.amm_dex.pipeline import (
+        PoolDeployer,
+        load_pool_specs,
+        required_funds,
     )
 
-    app_client = AmmDexClient(
-        algod_client,
-        creator=deployer,
-        indexer_client=indexer_client,
+    # the pools to stand up are listed in a JSON file, see pipeline.py for the format
+    pools_path = Path(os.environ.get("AMM_DEX_POOLS", "pools.json"))
+    state_path = Path(
+        os.environ.get(
+            "AMM_DEX_POOLS_STATE", f"{pools_path.with_suffix('')}.state.json"
+        )
     )
+    if not pools_path.exists():
+        logger.warning(f"No pool list found at {pools_path}, no pools deployed")
+        return
+    specs = load_pool_specs(pools_path)
 
-    app_client.deploy(
-        on_schema_break=algokit_utils.OnSchemaBreak.AppendApp,
-        on_update=algokit_utils.OnUpdate.AppendApp,
-    )
-    name = "world"
-    response = app_client.hello(name=name)
-    logger.info(
-        f"Called hello on {app_spec.contract.name} ({app_client.app_id}) "
-        f"with name={name}, received: {response.return_value}"
+    funds = required_funds(specs)
+    algokit_utils.ensure_funded(
+        algod_client,
+        algokit_utils.EnsureBalanceParameters(
+            account_to_fund=deployer,
+            min_spending_balance_micro_algos=funds,
+            min_funding_increment_micro_algos=funds,
+        ),
     )
+
+    pools = PoolDeployer(
+        algod_client, deployer, state_path, indexer_client=indexer_client
+    ).deploy(specs)
+    for key, pool in pools.items():
+        logger.info(
+            f"Pool {key} of {app_spec.contract.name} is app {pool.app_id} "
+            f"with pool token {pool.pool_token}"
+        )
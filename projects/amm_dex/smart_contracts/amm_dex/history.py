@@ -0,0 +1,258 @@
+"""
+Append-only, memory-mapped history of ConstantProductAMM pool snapshots.
+
+Each app ID gets its own directory holding one file per column. Every column is
+a flat array of little-endian uint64 values, so reading history back is a
+`numpy.memmap` of the file: nothing is parsed and untouched pages are never
+loaded. Snapshots must be appended in increasing round order, which keeps the
+round and timestamp columns sorted; those sorted columns are the index, and
+range lookups are a binary search over them.
+
+Layout:
+    <root>/<app_id>/round.u64
+    <root>/<app_id>/timestamp.u64
+    <root>/<app_id>/reserve_a.u64
+    ...
+    <root>/<app_id>/.lock           held by the writer while it appends
+"""
+
+import base64
+import contextlib
+import dataclasses
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+from algosdk.logic import get_application_address
+from algosdk.v2client.algod import AlgodClient
+
+from smart_contracts.amm_dex.lean_client import PoolMetadata
+from smart_contracts.amm_dex.pool_math import TOTAL_SUPPLY, ratio
+
+try:
+    import fcntl
+except ImportError:  # Windows, where appends are not protected against a second writer
+    fcntl = None  # type: ignore[assignment]
+
+COLUMNS = ("round", "timestamp", "reserve_a", "reserve_b", "lp_issued", "ratio")
+DTYPE = np.dtype("<u8")
+
+U64 = npt.NDArray[np.uint64]
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolSnapshot:
+    round: int
+    timestamp: int
+    reserve_a: int
+    reserve_b: int
+    lp_issued: int
+    ratio: int
+
+
+@dataclasses.dataclass(frozen=True)
+class HistoryRange:
+    """Zero-copy views of every column for a contiguous range of snapshots."""
+
+    round: U64
+    timestamp: U64
+    reserve_a: U64
+    reserve_b: U64
+    lp_issued: U64
+    ratio: U64
+
+    def __len__(self) -> int:
+        return len(self.round)
+
+
+@dataclasses.dataclass(frozen=True)
+class OHLC:
+    # start of each interval, in seconds
+    timestamp: U64
+    open: U64
+    high: U64
+    low: U64
+    close: U64
+    # number of snapshots aggregated into each interval
+    count: npt.NDArray[np.int64]
+
+
+class PoolHistory:
+    """
+    A pool's history store. Any number of processes may read it while one collector
+    appends to it.
+
+    Readers never modify the files. A row counts as committed once it has been
+    written to every column, so readers use the length of the shortest column and
+    ignore a row that an append has only partly written. Only `append` repairs the
+    files, under an exclusive lock on the store.
+    """
+
+    def __init__(self, root: Path, app_id: int) -> None:
+        self.app_id = app_id
+        self.path = root / str(app_id)
+        self._views: dict[str, U64] = {}
+
+    def __len__(self) -> int:
+        return min(self._column_length(name) for name in COLUMNS)
+
+    def _column_path(self, name: str) -> Path:
+        return self.path / f"{name}.u64"
+
+    def _column_length(self, name: str) -> int:
+        path = self._column_path(name)
+        return path.stat().st_size // DTYPE.itemsize if path.exists() else 0
+
+    @contextlib.contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        self.path.mkdir(parents=True, exist_ok=True)
+        with (self.path / ".lock").open("a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _repair(self) -> None:
+        """Truncates columns to the last row that was written to all of them."""
+        length = len(self)
+        for name in COLUMNS:
+            path = self._column_path(name)
+            if not path.exists():
+                path.touch()
+            elif path.stat().st_size != length * DTYPE.itemsize:
+                with path.open("r+b") as f:
+                    f.truncate(length * DTYPE.itemsize)
+
+    def append(self, snapshots: Sequence[PoolSnapshot]) -> None:
+        """Appends snapshots, which must be in strictly increasing round order."""
+        if not snapshots:
+            return
+        columns = {
+            name: np.array([getattr(s, name) for s in snapshots], dtype=DTYPE)
+            for name in COLUMNS
+        }
+        with self._write_lock():
+            # drops a row left behind by a writer that died part way through an append
+            self._repair()
+            rounds, timestamps = columns["round"], columns["timestamp"]
+            if len(self):
+                last = self.column("round")[-1], self.column("timestamp")[-1]
+                rounds, timestamps = np.r_[last[0], rounds], np.r_[last[1], timestamps]
+            if np.any(np.diff(rounds.astype(np.int64)) <= 0):
+                raise Exception(
+                    "Snapshots must be appended in strictly increasing round order"
+                )
+            if np.any(np.diff(timestamps.astype(np.int64)) < 0):
+                raise Exception("Snapshot timestamps must not decrease")
+
+            for name in COLUMNS:
+                with self._column_path(name).open("ab") as f:
+                    f.write(columns[name].tobytes())
+
+    def column(self, name: str) -> U64:
+        """
+        Read-only memory-mapped view of the committed rows of a column.
+
+        Views are remapped when rows have been committed since the last call, so a
+        reader that stays open sees new snapshots.
+        """
+        if name not in COLUMNS:
+            raise Exception(f"Unknown column {name}, expected one of {COLUMNS}")
+        length = len(self)
+        view = self._views.get(name)
+        if view is None or len(view) != length:
+            if length:
+                view = np.memmap(
+                    self._column_path(name), dtype=DTYPE, mode="r", shape=(length,)
+                )
+            else:
+                view = np.empty(0, dtype=DTYPE)
+            self._views[name] = view
+        return view
+
+    def _slice(self, start: int, stop: int) -> HistoryRange:
+        return HistoryRange(**{name: self.column(name)[start:stop] for name in COLUMNS})
+
+    def by_round(self, first: int, last: int) -> HistoryRange:
+        """Snapshots with first <= round <= last."""
+        rounds = self.column("round")
+        start = int(np.searchsorted(rounds, first, side="left"))
+        stop = int(np.searchsorted(rounds, last, side="right"))
+        return self._slice(start, stop)
+
+    def by_timestamp(self, start: int, end: int) -> HistoryRange:
+        """Snapshots with start <= timestamp < end."""
+        timestamps = self.column("timestamp")
+        first = int(np.searchsorted(timestamps, start, side="left"))
+        stop = int(np.searchsorted(timestamps, end, side="left"))
+        return self._slice(first, stop)
+
+    def latest(self) -> PoolSnapshot | None:
+        if not len(self):
+            return None
+        return PoolSnapshot(**{name: int(self.column(name)[-1]) for name in COLUMNS})
+
+
+def ohlc(history: HistoryRange, interval: int, column: str = "ratio") -> OHLC:
+    """Aggregates a column into open/high/low/close buckets of `interval` seconds."""
+    values: U64 = getattr(history, column)
+    if not len(history):
+        empty = np.empty(0, dtype=DTYPE)
+        return OHLC(empty, empty, empty, empty, empty, np.empty(0, dtype=np.int64))
+    buckets = history.timestamp // np.uint64(interval)
+    # timestamps are sorted, so each bucket is a contiguous run
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    return OHLC(
+        timestamp=buckets[starts] * np.uint64(interval),
+        open=values[starts],
+        high=np.maximum.reduceat(values, starts),
+        low=np.minimum.reduceat(values, starts),
+        close=values[ends - 1],
+        count=ends - starts,
+    )
+
+
+def fetch_metadata(algod_client: AlgodClient, app_id: int) -> PoolMetadata:
+    """Reads the asset IDs of a bootstrapped pool once, to be cached by the caller."""
+    app = algod_client.application_info(app_id)
+    assert isinstance(app, dict)
+    global_state = {
+        base64.b64decode(entry["key"]).decode(): entry["value"]["uint"]
+        for entry in app["params"]["global-state"]
+    }
+    if not global_state.get("pool_token"):
+        raise Exception(f"Pool {app_id} has not been bootstrapped")
+    return PoolMetadata(
+        app_id=app_id,
+        asset_a=global_state["asset_a"],
+        asset_b=global_state["asset_b"],
+        pool_token=global_state["pool_token"],
+    )
+
+
+def capture_snapshot(algod_client: AlgodClient, metadata: PoolMetadata) -> PoolSnapshot:
+    """
+    Reads the current reserves, LP supply and ratio of a pool from algod.
+
+    Everything comes from a single read of the app account, so the snapshot reflects
+    one round; the ratio is derived from the reserves the way the contract sets it.
+    """
+    account = algod_client.account_info(get_application_address(metadata.app_id))
+    assert isinstance(account, dict)
+    balances = {
+        holding["asset-id"]: holding["amount"] for holding in account.get("assets", [])
+    }
+    reserve_a = balances.get(metadata.asset_a, 0)
+    reserve_b = balances.get(metadata.asset_b, 0)
+    block = algod_client.block_info(account["round"])
+    assert isinstance(block, dict)
+    return PoolSnapshot(
+        round=account["round"],
+        timestamp=block["block"]["ts"],
+        reserve_a=reserve_a,
+        reserve_b=reserve_b,
+        lp_issued=TOTAL_SUPPLY - balances.get(metadata.pool_token, TOTAL_SUPPLY),
+        # the contract leaves the ratio at 0 until the first mint
+        ratio=ratio(a_balance=reserve_a, b_balance=reserve_b) if reserve_b else 0,
+    )
@@ -0,0 +1,294 @@
+import copy
+import dataclasses
+import functools
+import json
+import typing
+
+import algokit_utils
+from algokit_utils.logic_error import parse_logic_error
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    TransactionWithSigner,
+)
+from algosdk.encoding import decode_address
+from algosdk.source_map import SourceMap
+from algosdk.transaction import AssetTransferTxn
+from algosdk.v2client.models import SimulateRequest
+
+from smart_contracts.amm_dex.pool_math import BPS
+
+if typing.TYPE_CHECKING:
+    from smart_contracts.artifacts.amm_dex.constant_product_amm_client import (
+        ConstantProductAmmClient,
+    )
+
+# Keep in sync with smart_contracts/amm_dex/contract.py
+POSITION_BOX_PREFIX = b"p"
+# an address[] argument of 63 entries fills the 2KB application argument limit
+POSITIONS_PER_CALL = 63
+MAX_GROUP_SIZE = 16
+# the most extra budget simulate grants, reading positions is opcode heavy
+SIMULATE_OPCODE_BUDGET = 320_000
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolMetadata:
+    """Asset IDs of a bootstrapped pool, which never change after `bootstrap`."""
+
+    app_id: int
+    asset_a: int
+    asset_b: int
+    pool_token: int
+
+    @classmethod
+    def from_global_state(
+        cls, app_client: "ConstantProductAmmClient"
+    ) -> "PoolMetadata":
+        """Reads the metadata once, to be cached by the caller."""
+        state = app_client.get_global_state()
+        if not state.pool_token:
+            raise Exception(f"Pool {app_client.app_id} has not been bootstrapped")
+        return cls(
+            app_id=app_client.app_id,
+            asset_a=state.asset_a,
+            asset_b=state.asset_b,
+            pool_token=state.pool_token,
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class SwapPreflight:
+    """Outcome of simulating a swap: the output it would pay, or why it would fail."""
+
+    amount_out: int
+    failure: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.failure is None
+
+
+@dataclasses.dataclass(frozen=True)
+class LpPosition:
+    """Cumulative deposits and withdrawals recorded in an account's position box."""
+
+    a_deposited: int = 0
+    b_deposited: int = 0
+    lp_minted: int = 0
+    a_withdrawn: int = 0
+    b_withdrawn: int = 0
+    lp_burned: int = 0
+
+
+def position_box(address: str) -> tuple[int, bytes]:
+    """Box reference for the position of `address` in the called app."""
+    return 0, POSITION_BOX_PREFIX + decode_address(address)
+
+
+def fetch_positions(
+    app_client: "ConstantProductAmmClient", addresses: typing.Sequence[str]
+) -> dict[str, LpPosition]:
+    """
+    Reads the positions of many accounts with a single simulate of `get_positions`.
+
+    Addresses are split over as many calls as needed, up to a full group; callers
+    with more addresses than fit should call this once per batch.
+    """
+    capacity = POSITIONS_PER_CALL * MAX_GROUP_SIZE
+    if len(addresses) > capacity:
+        raise Exception(f"At most {capacity} positions can be read per call")
+    if not addresses:
+        # simulating an empty group is an error
+        return {}
+    atc = AtomicTransactionComposer()
+    composer = app_client.compose(atc)
+    for start in range(0, len(addresses), POSITIONS_PER_CALL):
+        composer.get_positions(
+            accounts=list(addresses[start : start + POSITIONS_PER_CALL])
+        )
+    result = atc.simulate(
+        app_client.algod_client,
+        SimulateRequest(
+            txn_groups=[],
+            # box references are not needed when simulating
+            allow_unnamed_resources=True,
+            allow_more_logs=True,
+            extra_opcode_budget=SIMULATE_OPCODE_BUDGET,
+        ),
+    )
+    if result.failure_message:
+        raise Exception(f"Could not read positions: {result.failure_message}")
+    positions = [
+        LpPosition(*position)
+        for abi_result in result.abi_results
+        for position in abi_result.return_value
+    ]
+    return dict(zip(addresses, positions, strict=True))
+
+
+def _with_position_box(
+    transaction_parameters: algokit_utils.TransactionParameters, address: str
+) -> algokit_utils.TransactionParameters:
+    return dataclasses.replace(
+        transaction_parameters,
+        boxes=[*(transaction_parameters.boxes or []), position_box(address)],
+    )
+
+
+def _with_foreign_assets(
+    transaction_parameters: algokit_utils.TransactionParameters | None,
+    assets: list[int],
+) -> algokit_utils.TransactionParameters:
+    transaction_parameters = (
+        transaction_parameters or algokit_utils.TransactionParameters()
+    )
+    return dataclasses.replace(
+        transaction_parameters,
+        foreign_assets=[*(transaction_parameters.foreign_assets or []), *assets],
+    )
+
+
+class LeanPoolClient:
+    """
+    Calls `mint_lean`, `burn_lean` and `swap_lean` with foreign assets taken from
+    cached PoolMetadata.
+
+    The regular `mint`, `burn` and `swap` methods resolve their asset arguments by
+    reading global state on every call; these only reference the assets that are not
+    already available to the group through the asset transfers. `mint` and `burn`
+    also reference the sender's position box, which `mint_lean` and `burn_lean` read
+    and update.
+    """
+
+    def __init__(
+        self, app_client: "ConstantProductAmmClient", metadata: PoolMetadata
+    ) -> None:
+        if app_client.app_id != metadata.app_id:
+            raise Exception(
+                f"Metadata for app {metadata.app_id} used with app {app_client.app_id}"
+            )
+        self.app_client = app_client
+        self.metadata = metadata
+
+    def mint(
+        self,
+        *,
+        a_xfer: TransactionWithSigner,
+        b_xfer: TransactionWithSigner,
+        transaction_parameters: algokit_utils.TransactionParameters | None = None,
+    ) -> algokit_utils.ABITransactionResponse[None]:
+        return self.app_client.mint_lean(
+            a_xfer=a_xfer,
+            b_xfer=b_xfer,
+            transaction_parameters=_with_position_box(
+                _with_foreign_assets(
+                    transaction_parameters, [self.metadata.pool_token]
+                ),
+                a_xfer.txn.sender,
+            ),
+        )
+
+    def burn(
+        self,
+        *,
+        pool_xfer: TransactionWithSigner,
+        transaction_parameters: algokit_utils.TransactionParameters | None = None,
+    ) -> algokit_utils.ABITransactionResponse[None]:
+        return self.app_client.burn_lean(
+            pool_xfer=pool_xfer,
+            transaction_parameters=_with_position_box(
+                _with_foreign_assets(
+                    transaction_parameters,
+                    [self.metadata.asset_a, self.metadata.asset_b],
+                ),
+                pool_xfer.txn.sender,
+            ),
+        )
+
+    def swap(
+        self,
+        *,
+        swap_xfer: TransactionWithSigner,
+        min_out: int = 0,
+        max_price_impact_bps: int = BPS,
+        expires_at: int = 0,
+        transaction_parameters: algokit_utils.TransactionParameters | None = None,
+    ) -> algokit_utils.ABITransactionResponse[int]:
+        return self.app_client.swap_lean(
+            swap_xfer=swap_xfer,
+            min_out=min_out,
+            max_price_impact_bps=max_price_impact_bps,
+            expires_at=expires_at,
+            transaction_parameters=_with_foreign_assets(
+                transaction_parameters, [self.other_asset(swap_xfer)]
+            ),
+        )
+
+    def preflight_swap(
+        self,
+        *,
+        swap_xfer: TransactionWithSigner,
+        min_out: int = 0,
+        max_price_impact_bps: int = BPS,
+        expires_at: int = 0,
+        transaction_parameters: algokit_utils.TransactionParameters | None = None,
+    ) -> SwapPreflight:
+        """
+        Simulates `swap` against the current pool state without submitting it.
+
+        A swap that would be rejected, for example because the ratio has moved past
+        `min_out` or `max_price_impact_bps`, is reported here instead of failing
+        on-chain. `swap_xfer` is copied, so it can still be passed to `swap`.
+        """
+        result = (
+            self.app_client.compose()
+            .swap_lean(
+                swap_xfer=TransactionWithSigner(
+                    copy.copy(swap_xfer.txn), swap_xfer.signer
+                ),
+                min_out=min_out,
+                max_price_impact_bps=max_price_impact_bps,
+                expires_at=expires_at,
+                transaction_parameters=_with_foreign_assets(
+                    transaction_parameters, [self.other_asset(swap_xfer)]
+                ),
+            )
+            .simulate()
+        )
+        if result.failure_message:
+            return SwapPreflight(
+                amount_out=0, failure=self._explain(result.failure_message)
+            )
+        return SwapPreflight(amount_out=result.abi_results[-1].return_value)
+
+    @functools.cached_property
+    def _assert_messages(self) -> dict[int, str]:
+        """Maps the pc of each assert in the approval program to its message."""
+        source_map = self.app_client.app_client.export_source_map()
+        if source_map is None:
+            return {}
+        lines = self.app_client.app_client.app_spec.approval_program.splitlines()
+        messages = {}
+        for pc, line in SourceMap(json.loads(source_map)).pc_to_line.items():
+            op, _, comment = lines[line].partition("//")
+            if op.strip() in ("assert", "err") and comment:
+                messages[pc] = comment.strip()
+        return messages
+
+    def _explain(self, failure_message: str) -> str:
+        error = parse_logic_error(failure_message)
+        if error is None:
+            return failure_message
+        return self._assert_messages.get(error["pc"], failure_message)
+
+    def other_asset(self, swap_xfer: TransactionWithSigner) -> int:
+        """The pool asset that `swap_xfer` does not already make available to the group."""
+        txn = swap_xfer.txn
+        assert isinstance(txn, AssetTransferTxn)
+        if txn.index == self.metadata.asset_a:
+            return self.metadata.asset_b
+        elif txn.index == self.metadata.asset_b:
+            return self.metadata.asset_a
+        raise Exception(
+            f"Asset {txn.index} is not traded by pool {self.metadata.app_id}"
+        )
@@ -0,0 +1,468 @@
+"""
+Create, fund, bootstrap and seed many ConstantProductAMM pools from a declarative list.
+
+Standing up a pool takes three dependent steps, each of which is an atomic group:
+
+    create     bare app create, up to 16 pools per group
+    bootstrap  seed payment + `bootstrap`, one pool per group (the contract requires
+               a group of exactly 2)
+    mint       pool token opt-in + A/B transfers + `mint_lean`, up to 4 pools per group
+
+Groups within a step are independent and are submitted concurrently. Progress is
+written to a JSON state file after every group, so re-running with the same pool
+list and state file resumes where a previous run stopped: pools that are already
+done are skipped, and steps that may have landed without being recorded are
+checked on-chain before being retried. A create is only retried once it provably
+never landed: it is looked up by its transaction ID on algod and by its note on the
+indexer, and after its validity window, the deployer's created apps must all be
+accounted for by the state file. When that can't be shown, the run stops instead of
+risking a second pool for the pair.
+
+Pool list format (JSON):
+
+    [{"asset_a": 1001, "asset_b": 1002, "a_amount": 1000000, "b_amount": 2000000}]
+"""
+
+import base64
+import concurrent.futures
+import copy
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+import typing
+from collections.abc import Callable, Iterator, Sequence
+from pathlib import Path
+
+import algokit_utils
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    TransactionWithSigner,
+)
+from algosdk.error import AlgodHTTPError
+from algosdk.logic import get_application_address
+from algosdk.transaction import (
+    AssetTransferTxn,
+    PaymentTxn,
+    SuggestedParams,
+    wait_for_confirmation,
+)
+from algosdk.v2client.algod import AlgodClient
+from algosdk.v2client.indexer import IndexerClient
+
+from smart_contracts.amm_dex.lean_client import PoolMetadata, position_box
+
+if typing.TYPE_CHECKING:
+    from smart_contracts.artifacts.amm_dex.constant_product_amm_client import (
+        ConstantProductAmmClient,
+    )
+
+logger = logging.getLogger(__name__)
+
+# covers the app account minimum balance: the account itself, the pool token and
+# the opt-ins to asset A and B
+SEED_AMOUNT = 400_000
+CREATES_PER_GROUP = 16
+MINTS_PER_GROUP = 4
+# inner transactions are sent with a zero fee, so the outer call pays for them
+BOOTSTRAP_INNER_TXNS = 3
+MINT_INNER_TXNS = 1
+NOTE_PREFIX = b"amm_dex:pool:"
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolSpec:
+    asset_a: int
+    asset_b: int
+    a_amount: int
+    b_amount: int
+
+    def __post_init__(self) -> None:
+        if self.asset_a >= self.asset_b:
+            raise ValueError(f"asset_a must be less than asset_b, got {self}")
+        if self.a_amount <= 0 or self.b_amount <= 0:
+            raise ValueError(f"initial liquidity must be positive, got {self}")
+
+    @property
+    def key(self) -> str:
+        return f"{self.asset_a}-{self.asset_b}"
+
+    @classmethod
+    def from_dict(cls, data: dict[str, int]) -> "PoolSpec":
+        """Builds a spec, ordering the pair the way `bootstrap` requires."""
+        a, b = (data["asset_a"], data["a_amount"]), (data["asset_b"], data["b_amount"])
+        (asset_a, a_amount), (asset_b, b_amount) = sorted([a, b])
+        return cls(
+            asset_a=asset_a, asset_b=asset_b, a_amount=a_amount, b_amount=b_amount
+        )
+
+
+@dataclasses.dataclass
+class PoolProgress:
+    app_id: int = 0
+    create_txid: str | None = None
+    create_last_valid: int = 0
+    pool_token: int = 0
+    # a step that was submitted but not recorded as done, to be checked on resume
+    submitted: str | None = None
+    seeded: bool = False
+
+
+def load_pool_specs(path: Path) -> list[PoolSpec]:
+    """Loads a pool list, rejecting pairs that appear more than once."""
+    specs = [PoolSpec.from_dict(entry) for entry in json.loads(path.read_text())]
+    keys = [spec.key for spec in specs]
+    duplicates = sorted({key for key in keys if keys.count(key) > 1})
+    if duplicates:
+        raise Exception(f"Pools listed more than once in {path}: {duplicates}")
+    return specs
+
+
+class _ProgressStore:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        data = json.loads(path.read_text()) if path.exists() else {}
+        self.pools = {key: PoolProgress(**value) for key, value in data.items()}
+
+    def get(self, spec: PoolSpec) -> PoolProgress:
+        with self._lock:
+            return self.pools.setdefault(spec.key, PoolProgress())
+
+    def update(self, spec: PoolSpec, **changes: object) -> None:
+        with self._lock:
+            progress = self.pools.setdefault(spec.key, PoolProgress())
+            for name, value in changes.items():
+                setattr(progress, name, value)
+            data = {key: dataclasses.asdict(p) for key, p in self.pools.items()}
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True))
+            os.replace(tmp_path, self.path)
+
+    def app_ids(self) -> set[int]:
+        with self._lock:
+            return {p.app_id for p in self.pools.values() if p.app_id}
+
+
+def _batches(items: Sequence[PoolSpec], size: int) -> Iterator[list[PoolSpec]]:
+    for start in range(0, len(items), size):
+        yield list(items[start : start + size])
+
+
+def _with_fee(params: SuggestedParams, inner_txns: int) -> SuggestedParams:
+    params = copy.copy(params)
+    params.flat_fee = True
+    params.fee = params.min_fee * (1 + inner_txns)
+    return params
+
+
+class PoolDeployer:
+    """Runs the create -> bootstrap -> mint steps for a list of pools."""
+
+    def __init__(
+        self,
+        algod_client: AlgodClient,
+        deployer: algokit_utils.Account,
+        state_path: Path,
+        *,
+        indexer_client: IndexerClient | None = None,
+        max_workers: int = 8,
+        seed_amount: int = SEED_AMOUNT,
+    ) -> None:
+        self.algod_client = algod_client
+        self.indexer_client = indexer_client
+        self.deployer = deployer
+        self.progress = _ProgressStore(state_path)
+        self.max_workers = max_workers
+        self.seed_amount = seed_amount
+        self._suggested_params: SuggestedParams | None = None
+
+    def deploy(self, specs: Sequence[PoolSpec]) -> dict[str, PoolMetadata]:
+        """Brings every pool to the seeded state and returns their metadata."""
+        # one suggested params fetch is shared by every group of this run
+        self._suggested_params = self.algod_client.suggested_params()
+        failures: list[str] = []
+
+        self._resume(specs)
+        to_create = [s for s in specs if not self.progress.get(s).app_id]
+        failures += self._run(self._create, _batches(to_create, CREATES_PER_GROUP))
+        to_bootstrap = [
+            s
+            for s in specs
+            if self.progress.get(s).app_id and not self.progress.get(s).pool_token
+        ]
+        failures += self._run(self._bootstrap, _batches(to_bootstrap, 1))
+        to_mint = [
+            s
+            for s in specs
+            if self.progress.get(s).pool_token and not self.progress.get(s).seeded
+        ]
+        failures += self._run(self._mint, _batches(to_mint, MINTS_PER_GROUP))
+        if failures:
+            raise Exception(
+                f"{len(failures)} pool groups failed, re-run to resume:\n"
+                + "\n".join(failures)
+            )
+
+        return {
+            spec.key: PoolMetadata(
+                app_id=self.progress.get(spec).app_id,
+                asset_a=spec.asset_a,
+                asset_b=spec.asset_b,
+                pool_token=self.progress.get(spec).pool_token,
+            )
+            for spec in specs
+        }
+
+    def _run(
+        self,
+        step: Callable[[list[PoolSpec]], None],
+        batches: typing.Iterable[list[PoolSpec]],
+    ) -> list[str]:
+        failures = []
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {executor.submit(step, batch): batch for batch in batches}
+            for future in concurrent.futures.as_completed(futures):
+                error = future.exception()
+                if error is not None:
+                    keys = ", ".join(spec.key for spec in futures[future])
+                    logger.error(
+                        f"{step.__name__.strip('_')} failed for {keys}: {error}"
+                    )
+                    failures.append(f"{keys}: {error}")
+        return failures
+
+    def _client(self, app_id: int = 0) -> "ConstantProductAmmClient":
+        from smart_contracts.artifacts.amm_dex.constant_product_amm_client import (
+            ConstantProductAmmClient,
+        )
+
+        return ConstantProductAmmClient(
+            self.algod_client,
+            app_id=app_id,
+            signer=self.deployer,
+            suggested_params=self._suggested_params,
+        )
+
+    def _resume(self, specs: Sequence[PoolSpec]) -> None:
+        """Reconciles steps that were submitted by a previous run but not recorded."""
+        for spec in specs:
+            progress = self.progress.get(spec)
+            if not progress.app_id and progress.create_txid:
+                app_id = self._find_created_app(spec, progress)
+                if app_id:
+                    self.progress.update(spec, app_id=app_id)
+                else:
+                    self.progress.update(spec, create_txid=None, create_last_valid=0)
+            elif progress.submitted in ("bootstrap", "mint"):
+                state = self._client(progress.app_id).get_global_state()
+                self.progress.update(
+                    spec,
+                    pool_token=state.pool_token or 0,
+                    seeded=bool(state.ratio),
+                    submitted=None,
+                )
+
+    def _find_created_app(self, spec: PoolSpec, progress: PoolProgress) -> int:
+        """
+        App ID created by the recorded create transaction of `spec`, or 0 if it
+        provably never landed. Raises when neither can be shown.
+        """
+        assert progress.create_txid is not None
+        try:
+            info = self.algod_client.pending_transaction_info(progress.create_txid)
+        except AlgodHTTPError:
+            info = {}  # no longer in algod's pending pool or cache
+        else:
+            assert isinstance(info, dict)
+            if info.get("pool-error"):
+                # rejected from the pool, so it can never be confirmed
+                return 0
+            if not info.get("confirmed-round"):
+                info = wait_for_confirmation(
+                    self.algod_client, progress.create_txid, wait_rounds=4
+                )
+        if info.get("application-index"):
+            return int(info["application-index"])
+        indexed_round = 0
+        if self.indexer_client is not None:
+            app_id, indexed_round = self._search_created_app(spec)
+            if app_id:
+                return app_id
+        status = self.algod_client.status()
+        assert isinstance(status, dict)
+        if status["last-round"] <= progress.create_last_valid:
+            raise Exception(
+                f"Could not determine whether {progress.create_txid} created an app, "
+                "retry after its validity window has passed"
+            )
+        if indexed_round > progress.create_last_valid:
+            # the indexer has seen every round the create could have landed in
+            return 0
+        unrecorded = self._unrecorded_apps()
+        if not unrecorded:
+            # pools can't be deleted, so a create that landed would still be listed
+            # as one of the deployer's apps
+            return 0
+        raise Exception(
+            f"Could not determine whether {progress.create_txid} created an app, the "
+            f"deployer created apps {unrecorded} that {self.progress.path} does not "
+            "record: configure an indexer, or record the pool's app_id in that file"
+        )
+
+    def _search_created_app(self, spec: PoolSpec) -> tuple[int, int]:
+        """
+        Looks up the deployer's create for `spec` on the indexer by its note. Returns
+        the app ID, 0 if none was found, and the round the indexer has reached.
+        """
+        assert self.indexer_client is not None
+        note = NOTE_PREFIX + spec.key.encode()
+        found = self.indexer_client.search_transactions(
+            note_prefix=note,
+            txn_type="appl",
+            address=self.deployer.address,
+            address_role="sender",
+        )
+        assert isinstance(found, dict)
+        indexed_round = int(found["current-round"])
+        for txn in found.get("transactions", []):
+            # a prefix search for "11-22" also finds "11-222"
+            if base64.b64decode(txn.get("note", "")) != note:
+                continue
+            if txn.get("created-application-index"):
+                return int(txn["created-application-index"]), indexed_round
+        return 0, indexed_round
+
+    def _unrecorded_apps(self) -> list[int]:
+        """Apps created by the deployer that no pool in the state file records."""
+        account = self.algod_client.account_info(self.deployer.address)
+        assert isinstance(account, dict)
+        recorded = self.progress.app_ids()
+        return sorted(
+            int(app["id"])
+            for app in account.get("created-apps", [])
+            if int(app["id"]) not in recorded
+        )
+
+    def _create(self, batch: list[PoolSpec]) -> None:
+        atc = AtomicTransactionComposer()
+        for spec in batch:
+            self._client().compose(atc).create_bare(
+                transaction_parameters=algokit_utils.CreateTransactionParameters(
+                    note=NOTE_PREFIX + spec.key.encode(),
+                    # a duplicate create for the same pair is rejected while the
+                    # first one could still land
+                    lease=hashlib.sha256(NOTE_PREFIX + spec.key.encode()).digest(),
+                )
+            )
+        txns = atc.build_group()
+        for spec, txn in zip(batch, txns, strict=True):
+            self.progress.update(
+                spec,
+                create_txid=txn.txn.get_txid(),
+                create_last_valid=txn.txn.last_valid_round,
+            )
+        result = atc.execute(self.algod_client, wait_rounds=4)
+        for spec, txid in zip(batch, result.tx_ids, strict=True):
+            info = self.algod_client.pending_transaction_info(txid)
+            assert isinstance(info, dict)
+            self.progress.update(spec, app_id=int(info["application-index"]))
+
+    def _bootstrap(self, batch: list[PoolSpec]) -> None:
+        (spec,) = batch
+        progress = self.progress.get(spec)
+        client = self._client(progress.app_id)
+        assert self._suggested_params is not None
+        seed = TransactionWithSigner(
+            PaymentTxn(
+                self.deployer.address,
+                self._suggested_params,
+                get_application_address(progress.app_id),
+                self.seed_amount,
+            ),
+            self.deployer.signer,
+        )
+        self.progress.update(spec, submitted="bootstrap")
+        result = (
+            client.compose()
+            .bootstrap(
+                seed=seed,
+                a_asset=spec.asset_a,
+                b_asset=spec.asset_b,
+                transaction_parameters=algokit_utils.TransactionParameters(
+                    suggested_params=_with_fee(
+                        self._suggested_params, BOOTSTRAP_INNER_TXNS
+                    )
+                ),
+            )
+            .execute()
+        )
+        self.progress.update(
+            spec, pool_token=result.abi_results[0].return_value, submitted=None
+        )
+
+    def _mint(self, batch: list[PoolSpec]) -> None:
+        assert self._suggested_params is not None
+        params = self._suggested_params
+        atc = AtomicTransactionComposer()
+        for spec in batch:
+            progress = self.progress.get(spec)
+            app_address = get_application_address(progress.app_id)
+            # a zero transfer to self is an opt-in, and a no-op when already opted in
+            atc.add_transaction(
+                TransactionWithSigner(
+                    AssetTransferTxn(
+                        self.deployer.address,
+                        params,
+                        self.deployer.address,
+                        0,
+                        progress.pool_token,
+                    ),
+                    self.deployer.signer,
+                )
+            )
+            self._client(progress.app_id).compose(atc).mint_lean(
+                a_xfer=TransactionWithSigner(
+                    AssetTransferTxn(
+                        self.deployer.address,
+                        params,
+                        app_address,
+                        spec.a_amount,
+                        spec.asset_a,
+                    ),
+                    self.deployer.signer,
+                ),
+                b_xfer=TransactionWithSigner(
+                    AssetTransferTxn(
+                        self.deployer.address,
+                        params,
+                        app_address,
+                        spec.b_amount,
+                        spec.asset_b,
+                    ),
+                    self.deployer.signer,
+                ),
+                transaction_parameters=algokit_utils.TransactionParameters(
+                    suggested_params=_with_fee(params, MINT_INNER_TXNS),
+                    foreign_assets=[progress.pool_token],
+                    boxes=[position_box(self.deployer.address)],
+                ),
+            )
+        for spec in batch:
+            self.progress.update(spec, submitted="mint")
+        atc.execute(self.algod_client, wait_rounds=4)
+        for spec in batch:
+            self.progress.update(spec, seeded=True, submitted=None)
+
+
+def required_funds(specs: Sequence[PoolSpec], seed_amount: int = SEED_AMOUNT) -> int:
+    """Upper bound of the microAlgos the deployer spends on `specs`, fees included."""
+    # create: 1 txn, bootstrap: payment + call, mint: opt-in + 2 transfers + call
+    fees = 1_000 * (1 + (1 + 1 + BOOTSTRAP_INNER_TXNS) + (3 + 1 + MINT_INNER_TXNS))
+    # creating the app and opting in to its pool token raise the deployer's minimum
+    # balance: 4 uint64 and 1 bytes global state values, plus one asset holding
+    app_balance = 100_000 + 28_500 * 4 + 50_000 * 1
+    opt_in_balance = 100_000
+    return len(specs) * (seed_amount + app_balance + opt_in_balance + fees)
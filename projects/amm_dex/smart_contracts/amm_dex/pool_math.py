@@ -0,0 +1,104 @@
+"""
+Off-chain mirror of the ConstantProductAMM pool math in `contract.py`.
+
+Every function reproduces the uint64 semantics of the AVM: intermediate results
+that overflow or underflow raise `OverflowError` and divisions by zero raise
+`ZeroDivisionError`, i.e. any `ArithmeticError` means the contract call would
+have failed. Unlike the contract, the precision settings are parameters so that
+tooling can evaluate settings other than the deployed ones.
+"""
+
+import math
+
+# Keep in sync with smart_contracts/amm_dex/contract.py
+TOTAL_SUPPLY = 10_000_000_000
+SCALE = 1000
+FEE = 5
+BPS = 10_000
+
+MAX_UINT64 = 2**64 - 1
+
+
+def uint64(value: int) -> int:
+    if not 0 <= value <= MAX_UINT64:
+        raise OverflowError(f"{value} is out of the uint64 range")
+    return value
+
+
+def tokens_to_mint(
+    *,
+    pool_balance: int,
+    a_balance: int,
+    b_balance: int,
+    a_amount: int,
+    b_amount: int,
+    scale: int = SCALE,
+    total_supply: int = TOTAL_SUPPLY,
+) -> int:
+    """Pool tokens minted for a deposit, balances include the deposit."""
+    is_initial_mint = a_balance == a_amount and b_balance == b_amount
+    if is_initial_mint:
+        return uint64(math.isqrt(uint64(a_amount * b_amount)) - scale)
+    issued = uint64(total_supply - pool_balance)
+    a_ratio = uint64(scale * a_amount) // uint64(a_balance - a_amount)
+    b_ratio = uint64(scale * b_amount) // uint64(b_balance - b_amount)
+    if a_ratio < b_ratio:
+        return uint64(a_ratio * issued) // scale
+    else:
+        return uint64(b_ratio * issued) // scale
+
+
+def tokens_to_burn(
+    *,
+    pool_balance: int,
+    supply: int,
+    amount: int,
+    total_supply: int = TOTAL_SUPPLY,
+) -> int:
+    """Amount of one pool asset returned for burning `amount` pool tokens."""
+    issued = uint64(uint64(total_supply - pool_balance) - amount)
+    return uint64(supply * amount) // issued
+
+
+def tokens_to_swap(
+    *,
+    in_amount: int,
+    in_supply: int,
+    out_supply: int,
+    scale: int = SCALE,
+    fee: int = FEE,
+) -> int:
+    """Amount of the out asset paid for `in_amount`, `in_supply` includes it."""
+    factor = uint64(scale - fee)
+    in_total = uint64(
+        uint64(scale * uint64(in_supply - in_amount)) + uint64(in_amount * factor)
+    )
+    out_total = uint64(uint64(in_amount * factor) * out_supply)
+    return out_total // in_total
+
+
+def within_price_impact(
+    *,
+    in_amount: int,
+    in_supply: int,
+    out_supply: int,
+    out_amount: int,
+    max_bps: int,
+    scale: int = SCALE,
+    fee: int = FEE,
+) -> bool:
+    """
+    Whether a swap paying `out_amount` for `in_amount` is within `max_bps` of the
+    pre-swap spot price after fees. The contract compares wide products, so only
+    the reserve subtraction can fail here.
+    """
+    if max_bps >= BPS:
+        return True
+    actual = out_amount * uint64(in_supply - in_amount) * scale * BPS
+    expected = in_amount * (scale - fee) * out_supply * (BPS - max_bps)
+    return actual >= expected
+
+
+def ratio(*, a_balance: int, b_balance: int, scale: int = SCALE) -> int:
+    """The `ratio` global state value for the given balances."""
+    return uint64(a_balance * scale) // b_balance
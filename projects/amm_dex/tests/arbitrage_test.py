@@ -0,0 +1,224 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+from algosdk.transaction import SuggestedParams
+
+from smart_contracts.amm_dex import pool_math
+from smart_contracts.amm_dex.arbitrage import (
+    ArbitrageScanner,
+    Opportunity,
+    PoolReserves,
+    compose_cycle,
+)
+
+A, B, C = 11, 22, 33
+
+
+def _best_profit(scanner: ArbitrageScanner, opportunity: Opportunity) -> int:
+    """Best profit over every input amount for the cycle of `opportunity`."""
+    best = 0
+    for amount_in in range(1, 20_000):
+        amount = amount_in
+        for hop in opportunity.hops:
+            in_reserve, out_reserve = scanner.pools[hop.app_id].reserves(hop.in_asset)
+            amount = pool_math.tokens_to_swap(
+                in_amount=amount, in_supply=in_reserve + amount, out_supply=out_reserve
+            )
+        best = max(best, amount - amount_in)
+    return best
+
+
+def _executed(
+    scanner: ArbitrageScanner, opportunity: Opportunity
+) -> list[PoolReserves]:
+    """Pool reserves after the swaps of `opportunity` have landed."""
+    pools = []
+    for hop in opportunity.hops:
+        pool = scanner.pools[hop.app_id]
+        a_delta = hop.amount_in if hop.in_asset == pool.asset_a else -hop.amount_out
+        b_delta = hop.amount_in if hop.in_asset == pool.asset_b else -hop.amount_out
+        pools.append(
+            PoolReserves(
+                pool.app_id,
+                pool.asset_a,
+                pool.asset_b,
+                pool.reserve_a + a_delta,
+                pool.reserve_b + b_delta,
+            )
+        )
+    return pools
+
+
+def test_balanced_pools_have_no_opportunity() -> None:
+    scanner = ArbitrageScanner()
+
+    assert (
+        scanner.update(
+            [
+                PoolReserves(1, A, B, 100_000, 200_000),
+                PoolReserves(2, A, B, 50_000, 100_000),
+                PoolReserves(3, B, C, 200_000, 300_000),
+                PoolReserves(4, A, C, 100_000, 300_000),
+            ]
+        )
+        == []
+    )
+
+
+def test_two_pool_cycle_uses_optimal_input() -> None:
+    scanner = ArbitrageScanner()
+    scanner.update(
+        [
+            PoolReserves(1, A, B, 100_000, 200_000),
+            PoolReserves(2, A, B, 100_000, 250_000),
+        ]
+    )
+
+    (opportunity,) = scanner.scan()
+
+    # A buys more B in pool 2 than it costs to buy back in pool 1
+    assert [(hop.app_id, hop.in_asset) for hop in opportunity.hops] == [(2, A), (1, B)]
+    assert opportunity.asset == A
+    # flooring at each hop can cost up to one unit per hop against a brute force
+    assert 0 <= _best_profit(scanner, opportunity) - opportunity.profit < 3
+
+
+def test_triangle_cycle() -> None:
+    scanner = ArbitrageScanner()
+    scanner.update(
+        [
+            PoolReserves(1, A, B, 100_000, 100_000),
+            PoolReserves(2, B, C, 100_000, 100_000),
+            PoolReserves(3, A, C, 110_000, 100_000),
+        ]
+    )
+
+    (opportunity,) = scanner.scan()
+
+    # A is cheap in pool 3 relative to the route through B
+    assert [hop.in_asset for hop in opportunity.hops] == [A, B, C]
+    assert [hop.app_id for hop in opportunity.hops] == [1, 2, 3]
+    # amounts chain from hop to hop
+    for previous, hop in zip(opportunity.hops, opportunity.hops[1:], strict=False):
+        assert hop.amount_in == previous.amount_out
+    # flooring at each hop can cost up to one unit per hop against a brute force
+    assert 0 <= _best_profit(scanner, opportunity) - opportunity.profit < 3
+
+
+def test_update_only_returns_cycles_through_changed_pools() -> None:
+    scanner = ArbitrageScanner()
+    scanner.update(
+        [
+            PoolReserves(1, A, B, 100_000, 200_000),
+            PoolReserves(2, A, B, 100_000, 250_000),
+            PoolReserves(3, B, C, 100_000, 100_000),
+        ]
+    )
+    assert len(scanner.scan()) == 1
+
+    assert scanner.update([PoolReserves(3, B, C, 100_000, 101_000)]) == []
+    (opportunity,) = scanner.update([PoolReserves(1, A, B, 100_000, 199_000)])
+
+    assert {hop.app_id for hop in opportunity.hops} == {1, 2}
+    # once the cycle has been traded the gap is closed
+    assert scanner.update(_executed(scanner, opportunity)) == []
+
+
+def test_removed_pools_are_ignored() -> None:
+    scanner = ArbitrageScanner()
+    scanner.update(
+        [
+            PoolReserves(1, A, B, 100_000, 200_000),
+            PoolReserves(2, A, B, 100_000, 250_000),
+        ]
+    )
+
+    scanner.remove(2)
+
+    assert len(scanner) == 1
+    assert scanner.scan() == []
+
+
+def test_base_assets_choose_where_cycles_start() -> None:
+    pools = [
+        PoolReserves(1, A, B, 100_000, 100_000),
+        PoolReserves(2, B, C, 100_000, 100_000),
+        PoolReserves(3, A, C, 110_000, 100_000),
+    ]
+    scanner = ArbitrageScanner(base_assets=[C])
+    scanner.update(pools)
+
+    (opportunity,) = scanner.scan()
+
+    assert opportunity.asset == C
+    assert opportunity.hops[-1].out_asset == C
+    assert ArbitrageScanner(base_assets=[99]).update(pools) == []
+
+
+def test_scan_matches_incremental_updates() -> None:
+    rng = random.Random(7)
+    value = {asset: rng.uniform(0.5, 2.0) for asset in range(1, 40)}
+    pools = []
+    for app_id in range(1, 2_000):
+        a, b = sorted(rng.sample(list(value), 2))
+        reserve_a = rng.randint(10**6, 10**9)
+        # most pools are priced within the fee of each other, a few are not
+        spread = 0.05 if rng.random() < 0.02 else 0.003
+        noise = rng.uniform(1 - spread, 1 + spread)
+        reserve_b = int(reserve_a * value[a] / value[b] * noise)
+        pools.append(PoolReserves(app_id, a, b, reserve_a, reserve_b))
+    scanner = ArbitrageScanner()
+
+    loaded = scanner.update(pools)
+    found = scanner.scan()
+
+    assert found
+    assert {o.hops for o in loaded} == {o.hops for o in found}
+    assert all(o.profit >= 1 and len(o.hops) in (2, 3) for o in found)
+    first = pools[0].app_id
+    through_first = {o.hops for o in found if any(h.app_id == first for h in o.hops)}
+    assert {o.hops for o in scanner.update([pools[0]])} == through_first
+
+
+def test_compose_cycle_sets_min_out_to_expected_output(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    scanner = ArbitrageScanner()
+    scanner.update(
+        [
+            PoolReserves(1, A, B, 100_000, 200_000),
+            PoolReserves(2, A, B, 100_000, 250_000),
+        ]
+    )
+    (opportunity,) = scanner.scan()
+    calls = []
+
+    class _Client:
+        def __init__(self, _: object, *, app_id: int, **__: object) -> None:
+            self.app_id = app_id
+
+        def compose(self, atc: object) -> "_Client":
+            return self
+
+        def swap_lean(self, **kwargs: object) -> None:
+            calls.append((self.app_id, kwargs))
+
+    module = pytest.importorskip(
+        "smart_contracts.artifacts.amm_dex.constant_product_amm_client"
+    )
+    monkeypatch.setattr(module, "ConstantProductAmmClient", _Client)
+    trader = SimpleNamespace(
+        address="A7NMWS3NT3IUDMLVO26ULGXGIIOUQ3ND2TXSER6EBGRZNOBOUIQXHIBGDE",
+        signer=None,
+    )
+    params = SuggestedParams(fee=0, first=1, last=1000, gh="", min_fee=1000)
+
+    compose_cycle(None, trader, opportunity, suggested_params=params)  # type: ignore[arg-type]
+
+    assert [(app_id, kwargs["min_out"]) for app_id, kwargs in calls] == [
+        (hop.app_id, hop.amount_out) for hop in opportunity.hops
+    ]
+    assert [kwargs["swap_xfer"].txn.amount for _, kwargs in calls] == [
+        hop.amount_in for hop in opportunity.hops
+    ]
@@ -0,0 +1,153 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smart_contracts.amm_dex.backtest import (
+    BURN,
+    MINT,
+    SWAP,
+    EventStream,
+    PoolConfig,
+    load_events,
+    replay_scalar,
+    run_backtest,
+    sweep_configs,
+    verify_sample,
+)
+
+
+@pytest.fixture()
+def events() -> EventStream:
+    rng = np.random.default_rng(seed=1)
+    size = 2_000
+    kind = rng.choice([SWAP] * 6 + [MINT, BURN], size=size).astype(np.uint8)
+    kind[0] = MINT
+    a_amount = rng.integers(1, 10_000_000, size=size).astype(np.uint64)
+    b_amount = rng.integers(1, 10_000_000, size=size).astype(np.uint64)
+    a_to_b = rng.random(size) < 0.5
+    a_amount[(kind == SWAP) & ~a_to_b] = 0
+    b_amount[(kind == SWAP) & a_to_b] = 0
+    a_amount[0] = b_amount[0] = 10_000_000_000
+    lp_amount = np.where(kind == BURN, rng.integers(1, 1_000_000, size=size), 0)
+    return EventStream(
+        kind=kind,
+        a_amount=a_amount,
+        b_amount=b_amount,
+        lp_amount=lp_amount.astype(np.uint64),
+    )
+
+
+def test_compiled_replay_matches_scalar_math(events: EventStream) -> None:
+    configs = sweep_configs(fees=[0, 3, 5, 30], scales=[1000, 100_000])
+
+    verify_sample(events, configs, sample_size=len(events))
+
+
+def test_higher_fee_increases_lp_return(events: EventStream) -> None:
+    low, high = run_backtest(events, [PoolConfig(fee=1), PoolConfig(fee=30)])
+
+    assert high.lp_return > low.lp_return
+    assert high.mean_slippage_bps > low.mean_slippage_bps
+
+
+def test_overflowing_swap_is_rejected() -> None:
+    events = EventStream(
+        kind=np.array([MINT, SWAP], dtype=np.uint8),
+        a_amount=np.array([2**31, 2**62], dtype=np.uint64),
+        b_amount=np.array([2**31, 0], dtype=np.uint64),
+        lp_amount=np.zeros(2, dtype=np.uint64),
+    )
+
+    (result,) = run_backtest(events, [PoolConfig()])
+
+    assert result.swaps == 0
+    assert result.rejected == 1
+    assert (result.a_reserve, result.b_reserve, result.issued) == replay_scalar(
+        events, PoolConfig()
+    )
+
+
+@pytest.fixture(params=["pyarrow", "rows"])
+def csv_reader(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> None:
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    else:
+        # an import of a None entry in sys.modules raises ImportError
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+
+@pytest.mark.usefixtures("csv_reader")
+def test_load_events_from_csv(tmp_path: Path) -> None:
+    path = tmp_path / "events.csv"
+    path.write_text(
+        "kind,a_amount,b_amount,lp_amount\n"
+        "mint,1000000,2000000,\n"
+        "swap,1000,,\n"
+        "burn,,,500\n"
+    )
+
+    events = load_events(path)
+
+    assert events.kind.tolist() == [MINT, SWAP, BURN]
+    assert events.a_amount.tolist() == [1_000_000, 1_000, 0]
+    assert events.lp_amount.tolist() == [0, 0, 500]
+    assert events.a_amount.dtype == np.uint64
+
+
+@pytest.mark.usefixtures("csv_reader")
+def test_load_events_rejects_unknown_kinds(tmp_path: Path) -> None:
+    path = tmp_path / "events.csv"
+    path.write_text("kind,a_amount,b_amount,lp_amount\nmint,1,1,\nflash,1,,\n")
+
+    with pytest.raises(Exception, match=r"Unknown event kinds .*\['flash'\]"):
+        load_events(path)
+
+
+def test_load_events_from_parquet(tmp_path: Path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "events.parquet"
+    pq.write_table(
+        pa.table(
+            {
+                "kind": ["mint", "swap", "burn"],
+                "a_amount": pa.array([1_000_000, None, None], type=pa.int64()),
+                "b_amount": pa.array([2_000_000, 1_000, None], type=pa.int64()),
+                "lp_amount": pa.array([None, None, 500], type=pa.int64()),
+            }
+        ),
+        path,
+    )
+
+    events = load_events(path)
+
+    assert events.kind.tolist() == [MINT, SWAP, BURN]
+    assert events.b_amount.tolist() == [2_000_000, 1_000, 0]
+    assert events.lp_amount.tolist() == [0, 0, 500]
+    assert events.b_amount.dtype == np.uint64
+
+
+def test_initial_mint_near_uint64_limit_matches_scalar_math() -> None:
+    # the kernel's integer square root starts from a float estimate, which is
+    # inexact for products above 2**52
+    amounts = [2**32 - 1, 2**32 - 2, 3_037_000_499, 94_906_267]
+    events = EventStream(
+        kind=np.full(len(amounts) ** 2, MINT, dtype=np.uint8),
+        a_amount=np.repeat(amounts, len(amounts)).astype(np.uint64),
+        b_amount=np.tile(amounts, len(amounts)).astype(np.uint64),
+        lp_amount=np.zeros(len(amounts) ** 2, dtype=np.uint64),
+    )
+
+    for i in range(len(events)):
+        single = EventStream(
+            kind=events.kind[i : i + 1],
+            a_amount=events.a_amount[i : i + 1],
+            b_amount=events.b_amount[i : i + 1],
+            lp_amount=events.lp_amount[i : i + 1],
+        )
+        (result,) = run_backtest(single, [PoolConfig()])
+        assert (result.a_reserve, result.b_reserve, result.issued) == replay_scalar(
+            single, PoolConfig()
+        )
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+from smart_contracts._helpers.build import (
+    _snake_case,
+    build_in_process,
+    has_in_process_backend,
+)
+
+HELLO_WORLD = """
+from algopy import ARC4Contract, String, arc4
+
+
+class HelloWorld(ARC4Contract):
+    @arc4.abimethod()
+    def hello(self, name: String) -> String:
+        return "Hello, " + name
+"""
+
+# app name -> {contract_name} that `algokit generate client -o {contract_name}_client.py`
+# substitutes, as produced by algokit's typed_client_generation._snake_case
+CLIENT_NAMES = [
+    ("ConstantProductAMM", "constant_product_amm"),
+    ("HelloWorld", "hello_world"),
+    ("ABCDef", "abc_def"),
+    ("Contract2Name", "contract2_name"),
+    ("my-contract", "my_contract"),
+    ("Two Words", "two_words"),
+    ("already_snake", "already_snake"),
+]
+
+
+@pytest.mark.parametrize(("app_name", "expected"), CLIENT_NAMES)
+def test_snake_case_matches_algokit_client_names(app_name: str, expected: str) -> None:
+    assert _snake_case(app_name) == expected
+
+
+@pytest.mark.skipif(not has_in_process_backend(), reason="puyapy is not installed")
+def test_build_in_process_writes_client(tmp_path: Path) -> None:
+    contract_path = tmp_path / "hello_world" / "contract.py"
+    contract_path.parent.mkdir()
+    contract_path.write_text(HELLO_WORLD)
+    output_dir = tmp_path / "artifacts" / "hello_world"
+
+    app_spec_path = build_in_process(output_dir, contract_path)
+
+    assert app_spec_path == output_dir.resolve() / "HelloWorld.arc32.json"
+    assert (output_dir / "HelloWorld.approval.teal").exists()
+    client = (output_dir / "hello_world_client.py").read_text()
+    assert "class HelloWorldClient" in client
@@ -0,0 +1,219 @@
+import base64
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+from algosdk.logic import get_application_address
+
+from smart_contracts.amm_dex import pool_math
+from smart_contracts.amm_dex.history import (
+    PoolHistory,
+    PoolSnapshot,
+    capture_snapshot,
+    fetch_metadata,
+    ohlc,
+)
+from smart_contracts.amm_dex.lean_client import PoolMetadata
+
+
+def _snapshot(round_: int, timestamp: int, ratio: int) -> PoolSnapshot:
+    return PoolSnapshot(
+        round=round_,
+        timestamp=timestamp,
+        reserve_a=1_000 + round_,
+        reserve_b=2_000,
+        lp_issued=1_500,
+        ratio=ratio,
+    )
+
+
+@pytest.fixture()
+def history(tmp_path: Path) -> PoolHistory:
+    history = PoolHistory(tmp_path, app_id=1234)
+    history.append(
+        [_snapshot(r, 1_000 + 3 * r, ratio=500 + (r % 7)) for r in range(1, 101)]
+    )
+    return history
+
+
+def test_append_and_reopen(history: PoolHistory, tmp_path: Path) -> None:
+    history.append([_snapshot(101, 1_400, ratio=600)])
+
+    reopened = PoolHistory(tmp_path, app_id=1234)
+
+    assert len(reopened) == 101
+    assert reopened.latest() == _snapshot(101, 1_400, ratio=600)
+    assert isinstance(reopened.column("ratio"), np.memmap)
+
+
+def test_append_rejects_out_of_order_rounds(history: PoolHistory) -> None:
+    with pytest.raises(Exception, match="increasing round order"):
+        history.append([_snapshot(100, 2_000, ratio=500)])
+
+
+def test_range_queries(history: PoolHistory) -> None:
+    by_round = history.by_round(10, 19)
+    by_timestamp = history.by_timestamp(1_030, 1_060)
+
+    assert by_round.round.tolist() == list(range(10, 20))
+    assert by_timestamp.round.tolist() == list(range(10, 20))
+    assert np.shares_memory(by_round.ratio, history.column("ratio"))
+
+
+def _write_partial_row(history: PoolHistory, columns: list[str]) -> None:
+    # what a concurrent append has written so far, or a crashed writer left behind
+    for name in columns:
+        with (history.path / f"{name}.u64").open("ab") as f:
+            f.write(np.array([101], dtype="<u8").tobytes())
+
+
+def test_reader_ignores_row_being_appended(
+    history: PoolHistory, tmp_path: Path
+) -> None:
+    open_reader = PoolHistory(tmp_path, app_id=1234)
+    assert len(open_reader.by_round(1, 200)) == 100
+
+    _write_partial_row(history, ["round", "timestamp"])
+    new_reader = PoolHistory(tmp_path, app_id=1234)
+
+    for reader in (open_reader, new_reader):
+        assert len(reader) == 100
+        assert (
+            reader.by_round(1, 200).ratio.tolist() == history.column("ratio").tolist()
+        )
+    # readers never truncate the row the writer is in the middle of
+    assert (history.path / "round.u64").stat().st_size == 101 * 8
+
+    _write_partial_row(history, ["reserve_a", "reserve_b", "lp_issued", "ratio"])
+
+    assert len(open_reader.by_round(1, 200)) == 101
+
+
+def test_reader_alongside_writer_thread(history: PoolHistory, tmp_path: Path) -> None:
+    reader = PoolHistory(tmp_path, app_id=1234)
+
+    def write() -> None:
+        for r in range(101, 301):
+            history.append([_snapshot(r, 1_000 + 3 * r, ratio=500)])
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while writer.is_alive():
+        rows = reader.by_round(1, 1_000)
+        assert rows.round.tolist() == list(range(1, len(rows) + 1))
+        assert rows.reserve_a.tolist() == [1_000 + r for r in rows.round.tolist()]
+    writer.join()
+
+    assert len(reader) == 300
+
+
+def test_torn_append_is_truncated_by_next_append(
+    history: PoolHistory, tmp_path: Path
+) -> None:
+    _write_partial_row(history, ["round"])
+
+    writer = PoolHistory(tmp_path, app_id=1234)
+    writer.append([_snapshot(101, 1_400, ratio=600)])
+
+    assert len(writer) == 101
+    assert writer.latest() == _snapshot(101, 1_400, ratio=600)
+    assert (history.path / "round.u64").stat().st_size == 101 * 8
+
+
+def test_missing_store_reads_as_empty(tmp_path: Path) -> None:
+    history = PoolHistory(tmp_path, app_id=1)
+
+    assert len(history) == 0
+    assert history.latest() is None
+    assert not history.path.exists()
+
+
+def test_ohlc(history: PoolHistory) -> None:
+    candles = ohlc(history.by_round(1, 100), interval=60)
+    ratio = history.column("ratio")
+    first_bucket = ratio[history.column("timestamp") < 1_020]
+
+    assert candles.timestamp[0] == 960
+    assert candles.open[0] == first_bucket[0]
+    assert candles.close[0] == first_bucket[-1]
+    assert candles.high[0] == first_bucket.max()
+    assert candles.low[0] == first_bucket.min()
+    assert candles.count.sum() == len(history)
+
+
+METADATA = PoolMetadata(app_id=1234, asset_a=11, asset_b=22, pool_token=33)
+
+
+class _FakeAlgod:
+    def __init__(self, global_state: dict[str, int], balances: dict[int, int]) -> None:
+        self.global_state = global_state
+        self.balances = balances
+        self.requests: list[str] = []
+
+    def application_info(self, app_id: int) -> dict:
+        self.requests.append("application_info")
+        return {
+            "params": {
+                "global-state": [
+                    {"key": base64.b64encode(k.encode()).decode(), "value": {"uint": v}}
+                    for k, v in self.global_state.items()
+                ]
+            }
+        }
+
+    def account_info(self, address: str) -> dict:
+        self.requests.append("account_info")
+        assert address == get_application_address(METADATA.app_id)
+        return {
+            "round": 77,
+            "assets": [
+                {"asset-id": asset, "amount": amount}
+                for asset, amount in self.balances.items()
+            ],
+        }
+
+    def block_info(self, round_num: int) -> dict:
+        self.requests.append("block_info")
+        return {"block": {"ts": 1_700_000_000 + round_num}}
+
+
+def test_fetch_metadata_reads_asset_ids() -> None:
+    algod = _FakeAlgod(
+        {"asset_a": 11, "asset_b": 22, "pool_token": 33, "ratio": 5}, balances={}
+    )
+
+    assert fetch_metadata(algod, 1234) == METADATA  # type: ignore[arg-type]
+
+    algod.global_state["pool_token"] = 0
+    with pytest.raises(Exception, match="not been bootstrapped"):
+        fetch_metadata(algod, 1234)  # type: ignore[arg-type]
+
+
+def test_snapshot_ratio_matches_reserves_of_its_round() -> None:
+    # the stored ratio lags the reserves, as it would after a swap landing between
+    # a read of global state and a read of the app account
+    algod = _FakeAlgod(
+        {"asset_a": 11, "asset_b": 22, "pool_token": 33, "ratio": 999},
+        balances={11: 3_000_000, 22: 2_000_000, 33: pool_math.TOTAL_SUPPLY - 400},
+    )
+
+    snapshot = capture_snapshot(algod, METADATA)  # type: ignore[arg-type]
+
+    assert snapshot == PoolSnapshot(
+        round=77,
+        timestamp=1_700_000_077,
+        reserve_a=3_000_000,
+        reserve_b=2_000_000,
+        lp_issued=400,
+        ratio=pool_math.ratio(a_balance=3_000_000, b_balance=2_000_000),
+    )
+    assert algod.requests == ["account_info", "block_info"]
+
+
+def test_snapshot_before_first_mint_has_zero_ratio() -> None:
+    algod = _FakeAlgod({}, balances={11: 0, 22: 0, 33: pool_math.TOTAL_SUPPLY})
+
+    snapshot = capture_snapshot(algod, METADATA)  # type: ignore[arg-type]
+
+    assert (snapshot.reserve_a, snapshot.lp_issued, snapshot.ratio) == (0, 0, 0)
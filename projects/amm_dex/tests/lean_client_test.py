@@ -0,0 +1,257 @@
+from types import SimpleNamespace
+
+import algokit_utils
+import pytest
+from algosdk.atomic_transaction_composer import TransactionWithSigner
+from algosdk.transaction import AssetTransferTxn, SuggestedParams
+from algosdk.v2client.models import SimulateRequest
+
+from smart_contracts.amm_dex import lean_client
+from smart_contracts.amm_dex.lean_client import (
+    LeanPoolClient,
+    LpPosition,
+    PoolMetadata,
+    SwapPreflight,
+    fetch_positions,
+    position_box,
+)
+
+METADATA = PoolMetadata(app_id=1001, asset_a=11, asset_b=22, pool_token=33)
+SENDER = "A7NMWS3NT3IUDMLVO26ULGXGIIOUQ3ND2TXSER6EBGRZNOBOUIQXHIBGDE"
+
+
+class _RecordingClient:
+    app_id = METADATA.app_id
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, algokit_utils.TransactionParameters]] = []
+
+    def __getattr__(self, name: str) -> object:
+        def call(
+            *, transaction_parameters: algokit_utils.TransactionParameters, **_: object
+        ) -> None:
+            self.calls.append((name, transaction_parameters))
+
+        return call
+
+
+def _axfer(asset_id: int) -> TransactionWithSigner:
+    params = SuggestedParams(fee=1000, first=1, last=1000, gh="", flat_fee=True)
+    txn = AssetTransferTxn(SENDER, params, SENDER, 10, asset_id)
+    return TransactionWithSigner(txn, signer=None)  # type: ignore[arg-type]
+
+
+@pytest.fixture()
+def app_client() -> _RecordingClient:
+    return _RecordingClient()
+
+
+def test_foreign_assets_only_reference_assets_missing_from_group(
+    app_client: _RecordingClient,
+) -> None:
+    client = LeanPoolClient(app_client, METADATA)  # type: ignore[arg-type]
+
+    client.mint(a_xfer=_axfer(11), b_xfer=_axfer(22))
+    client.burn(pool_xfer=_axfer(33))
+    client.swap(swap_xfer=_axfer(22))
+
+    assert [(name, p.foreign_assets) for name, p in app_client.calls] == [
+        ("mint_lean", [33]),
+        ("burn_lean", [11, 22]),
+        ("swap_lean", [11]),
+    ]
+
+
+def test_mint_and_burn_reference_sender_position_box(
+    app_client: _RecordingClient,
+) -> None:
+    client = LeanPoolClient(app_client, METADATA)  # type: ignore[arg-type]
+
+    client.mint(a_xfer=_axfer(11), b_xfer=_axfer(22))
+    client.burn(pool_xfer=_axfer(33))
+    client.swap(swap_xfer=_axfer(22))
+
+    assert [(name, p.boxes) for name, p in app_client.calls] == [
+        ("mint_lean", [position_box(SENDER)]),
+        ("burn_lean", [position_box(SENDER)]),
+        ("swap_lean", None),
+    ]
+
+
+def test_caller_transaction_parameters_are_kept(app_client: _RecordingClient) -> None:
+    client = LeanPoolClient(app_client, METADATA)  # type: ignore[arg-type]
+
+    client.swap(
+        swap_xfer=_axfer(11),
+        transaction_parameters=algokit_utils.TransactionParameters(
+            note=b"bot", foreign_assets=[44]
+        ),
+    )
+
+    ((_, params),) = app_client.calls
+    assert params.note == b"bot"
+    assert params.foreign_assets == [44, 22]
+
+
+def test_swap_of_unknown_asset_is_rejected(app_client: _RecordingClient) -> None:
+    client = LeanPoolClient(app_client, METADATA)  # type: ignore[arg-type]
+
+    with pytest.raises(Exception, match="not traded by pool"):
+        client.swap(swap_xfer=_axfer(99))
+
+
+class _SimulatingClient(_RecordingClient):
+    def __init__(self, failure_message: str = "", return_value: int = 0) -> None:
+        super().__init__()
+        self.failure_message = failure_message
+        self.return_value = return_value
+        self.swap_xfers: list[TransactionWithSigner] = []
+
+    def compose(self) -> "_SimulatingClient":
+        return self
+
+    def swap_lean(
+        self,
+        *,
+        swap_xfer: TransactionWithSigner,
+        transaction_parameters: algokit_utils.TransactionParameters,
+        **_: object,
+    ) -> "_SimulatingClient":
+        self.swap_xfers.append(swap_xfer)
+        self.calls.append(("swap_lean", transaction_parameters))
+        return self
+
+    def simulate(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            failure_message=self.failure_message,
+            abi_results=[SimpleNamespace(return_value=self.return_value)],
+        )
+
+    def export_source_map(self) -> None:
+        return None
+
+    @property
+    def app_client(self) -> "_SimulatingClient":
+        return self
+
+
+def test_preflight_returns_simulated_output() -> None:
+    app_client = _SimulatingClient(return_value=180)
+    client = LeanPoolClient(app_client, METADATA)  # type: ignore[arg-type]
+    swap_xfer = _axfer(11)
+
+    result = client.preflight_swap(swap_xfer=swap_xfer, min_out=150)
+
+    assert result == SwapPreflight(amount_out=180)
+    assert result.ok
+    assert app_client.calls[0][1].foreign_assets == [22]
+    # the simulated group gets its own copy of the transfer
+    assert app_client.swap_xfers[0].txn is not swap_xfer.txn
+
+
+def test_preflight_reports_rejection() -> None:
+    failure = "transaction ABC: logic eval error: assert failed pc=123. Details: pc=123"
+    client = LeanPoolClient(
+        _SimulatingClient(failure_message=failure), METADATA  # type: ignore[arg-type]
+    )
+
+    result = client.preflight_swap(swap_xfer=_axfer(11), min_out=10**9)
+
+    assert not result.ok
+    assert result.failure == failure
+
+
+class _PositionsAtc:
+    """Simulates queued `get_positions` calls, with the ATC's group size limit."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+        self.requests: list[SimulateRequest] = []
+
+    def simulate(self, _: object, request: SimulateRequest) -> SimpleNamespace:
+        if not self.calls:
+            raise Exception("no transactions to simulate")
+        self.requests.append(request)
+        return SimpleNamespace(
+            failure_message="",
+            abi_results=[
+                SimpleNamespace(return_value=[_position(a) for a in accounts])
+                for accounts in self.calls
+            ],
+        )
+
+
+class _PositionsClient:
+    algod_client = None
+
+    def __init__(self) -> None:
+        self.atcs: list[_PositionsAtc] = []
+
+    def compose(self, atc: _PositionsAtc) -> "_PositionsClient":
+        self.atcs.append(atc)
+        return self
+
+    def get_positions(self, *, accounts: list[str]) -> "_PositionsClient":
+        atc = self.atcs[-1]
+        if len(atc.calls) == 16:
+            raise Exception("AtomicTransactionComposer cannot exceed MAX_GROUP_SIZE")
+        atc.calls.append(accounts)
+        return self
+
+
+def _position(address: str) -> tuple[int, ...]:
+    index = int(address.removeprefix("ADDR"))
+    return (index, 2 * index, 3 * index, 0, 0, index % 2)
+
+
+@pytest.fixture()
+def positions_client(monkeypatch: pytest.MonkeyPatch) -> _PositionsClient:
+    monkeypatch.setattr(lean_client, "AtomicTransactionComposer", _PositionsAtc)
+    return _PositionsClient()
+
+
+def test_fetch_positions_chunks_addresses_and_decodes_results(
+    positions_client: _PositionsClient,
+) -> None:
+    addresses = [f"ADDR{i}" for i in range(2 * 63 + 1)]
+
+    positions = fetch_positions(positions_client, addresses)  # type: ignore[arg-type]
+
+    (atc,) = positions_client.atcs
+    assert [len(accounts) for accounts in atc.calls] == [63, 63, 1]
+    assert [a for accounts in atc.calls for a in accounts] == addresses
+    assert positions["ADDR0"] == LpPosition(0, 0, 0, 0, 0, 0)
+    assert positions["ADDR125"] == LpPosition(
+        a_deposited=125,
+        b_deposited=250,
+        lp_minted=375,
+        a_withdrawn=0,
+        b_withdrawn=0,
+        lp_burned=1,
+    )
+    assert list(positions) == addresses
+    (request,) = atc.requests
+    assert request.allow_unnamed_resources
+
+
+def test_fetch_positions_is_capped_at_one_group(
+    positions_client: _PositionsClient,
+) -> None:
+    addresses = [f"ADDR{i}" for i in range(63 * 16 + 1)]
+
+    positions = fetch_positions(
+        positions_client, addresses[:-1]  # type: ignore[arg-type]
+    )
+    with pytest.raises(Exception, match="At most 1008 positions"):
+        fetch_positions(positions_client, addresses)  # type: ignore[arg-type]
+
+    assert len(positions) == 63 * 16
+    (atc,) = positions_client.atcs
+    assert len(atc.calls) == 16
+
+
+def test_fetch_positions_of_no_addresses_skips_simulate(
+    positions_client: _PositionsClient,
+) -> None:
+    assert fetch_positions(positions_client, []) == {}  # type: ignore[arg-type]
+    assert positions_client.atcs == []
@@ -0,0 +1,116 @@
+import json
+import runpy
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from algosdk.v2client.algod import AlgodClient
+
+from smart_contracts._helpers import config
+from smart_contracts._helpers import metrics as metrics_module
+from smart_contracts._helpers.config import SmartContract
+from smart_contracts._helpers.metrics import Metrics
+
+
+class _FakeAlgod:
+    def algod_request(self, method: str, requrl: str, **_: object) -> dict:
+        if requrl.startswith("/missing"):
+            raise Exception("not found")
+        return {}
+
+
+def _algod() -> AlgodClient:
+    return _FakeAlgod()  # type: ignore[return-value]
+
+
+def test_phase_records_duration_and_failure() -> None:
+    metrics = Metrics()
+    with metrics.phase("compile", "amm_dex"):
+        pass
+    with pytest.raises(Exception, match="boom"), metrics.phase("deploy", "amm_dex"):
+        raise Exception("boom")
+
+    report = metrics.report()
+
+    assert [(p["name"], p["ok"]) for p in report["phases"]] == [
+        ("compile", True),
+        ("deploy", False),
+    ]
+    assert not report["ok"]
+    assert all(p["seconds"] >= 0 for p in report["phases"])
+
+
+def test_algod_calls_go_to_innermost_phase() -> None:
+    metrics = Metrics()
+    algod = metrics.instrument_algod(_algod())
+    with metrics.phase("deploy", "amm_dex"):
+        with metrics.phase("fund", "amm_dex"):
+            algod.algod_request("GET", "/accounts/" + "A" * 58)
+        # worker threads are attributed to the phase open in the main thread
+        thread = threading.Thread(
+            target=algod.algod_request, args=("GET", "/applications/1001")
+        )
+        thread.start()
+        thread.join()
+        algod.algod_request("GET", "/applications/1002?format=json")
+        with pytest.raises(Exception, match="not found"):
+            algod.algod_request("GET", "/missing")
+
+    deploy, fund = metrics.report()["phases"]
+
+    assert fund["algod"]["GET /accounts/{id}"]["count"] == 1
+    assert deploy["algod"]["GET /applications/{id}"]["count"] == 2
+    assert deploy["algod"]["GET /missing"]["errors"] == 1
+
+
+def test_subprocess_time_is_recorded() -> None:
+    metrics = Metrics()
+    with metrics.phase("compile", "amm_dex"):
+        metrics.run([sys.executable, "-c", "pass"], check=True)
+
+    (compile_phase,) = metrics.report()["phases"]
+
+    assert 0 < compile_phase["subprocess_seconds"] <= compile_phase["seconds"]
+
+
+def test_write_json_and_prometheus(tmp_path: Path) -> None:
+    metrics = Metrics()
+    algod = metrics.instrument_algod(_algod())
+    for _ in range(2):
+        with metrics.phase("compile", "amm_dex"):
+            algod.algod_request("GET", "/status")
+
+    metrics.write(tmp_path / "metrics.json", tmp_path / "metrics.prom")
+
+    assert len(json.loads((tmp_path / "metrics.json").read_text())["phases"]) == 2
+    lines = (tmp_path / "metrics.prom").read_text().splitlines()
+    assert "# TYPE smart_contracts_phase_seconds gauge" in lines
+    # repeated phases are summed into one series
+    assert (
+        'smart_contracts_algod_requests{phase="compile",contract="amm_dex",'
+        'endpoint="GET /status"} 2.0'
+    ) in lines
+    assert not (tmp_path / "metrics.prom.tmp").exists()
+
+
+def test_run_failing_outside_phases_is_reported_as_failed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # deploying a contract that was never built fails before any deploy phase opens
+    monkeypatch.setattr(
+        config, "contracts", [SmartContract(path=tmp_path, name="never_built")]
+    )
+    monkeypatch.setattr(metrics_module, "metrics", Metrics())
+    monkeypatch.setattr(sys, "argv", ["smart_contracts", "deploy"])
+    monkeypatch.setenv("SMART_CONTRACTS_METRICS_JSON", str(tmp_path / "metrics.json"))
+    monkeypatch.setenv("SMART_CONTRACTS_METRICS_PROM", str(tmp_path / "metrics.prom"))
+
+    with pytest.raises(FileNotFoundError):
+        runpy.run_module("smart_contracts", run_name="__main__")
+
+    report = json.loads((tmp_path / "metrics.json").read_text())
+    assert [(p["name"], p["ok"]) for p in report["phases"]] == [("run", False)]
+    assert not report["ok"]
+    lines = (tmp_path / "metrics.prom").read_text().splitlines()
+    assert "smart_contracts_run_success 0.0" in lines
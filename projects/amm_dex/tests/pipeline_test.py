@@ -0,0 +1,508 @@
+import base64
+import json
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import algokit_utils
+import pytest
+from algosdk import account
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    TransactionWithSigner,
+)
+from algosdk.error import AlgodHTTPError
+from algosdk.transaction import (
+    ApplicationCallTxn,
+    ApplicationCreateTxn,
+    ApplicationNoOpTxn,
+    OnComplete,
+    SignedTransaction,
+    StateSchema,
+    SuggestedParams,
+    Transaction,
+)
+
+from smart_contracts.amm_dex.lean_client import position_box
+from smart_contracts.amm_dex.pipeline import (
+    NOTE_PREFIX,
+    PoolDeployer,
+    PoolSpec,
+    _batches,
+    _ProgressStore,
+    _with_fee,
+    load_pool_specs,
+    required_funds,
+)
+
+
+def test_from_dict_orders_pair() -> None:
+    spec = PoolSpec.from_dict(
+        {"asset_a": 22, "asset_b": 11, "a_amount": 5, "b_amount": 7}
+    )
+
+    assert spec == PoolSpec(asset_a=11, asset_b=22, a_amount=7, b_amount=5)
+    assert spec.key == "11-22"
+
+
+def test_spec_rejects_invalid_pairs() -> None:
+    with pytest.raises(ValueError):
+        PoolSpec(asset_a=11, asset_b=11, a_amount=1, b_amount=1)
+    with pytest.raises(ValueError):
+        PoolSpec(asset_a=11, asset_b=22, a_amount=0, b_amount=1)
+
+
+def test_load_rejects_duplicates(tmp_path: Path) -> None:
+    path = tmp_path / "pools.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"asset_a": 11, "asset_b": 22, "a_amount": 1, "b_amount": 2},
+                {"asset_a": 22, "asset_b": 11, "a_amount": 3, "b_amount": 4},
+            ]
+        )
+    )
+
+    with pytest.raises(Exception, match="11-22"):
+        load_pool_specs(path)
+
+
+def test_progress_survives_restart(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    spec = PoolSpec(asset_a=11, asset_b=22, a_amount=1, b_amount=2)
+    store = _ProgressStore(path)
+    store.update(spec, app_id=1001, create_txid="TX", submitted="bootstrap")
+
+    progress = _ProgressStore(path).get(spec)
+
+    assert progress.app_id == 1001
+    assert progress.create_txid == "TX"
+    assert progress.submitted == "bootstrap"
+    assert progress.pool_token == 0
+    assert not path.with_suffix(".json.tmp").exists()
+
+
+def test_batches() -> None:
+    specs = [
+        PoolSpec(asset_a=i, asset_b=i + 1, a_amount=1, b_amount=1) for i in range(5)
+    ]
+
+    assert [len(batch) for batch in _batches(specs, 2)] == [2, 2, 1]
+
+
+def test_with_fee_covers_inner_transactions() -> None:
+    params = SuggestedParams(fee=0, first=1, last=1000, gh="", min_fee=1000)
+
+    fee_params = _with_fee(params, 3)
+
+    assert fee_params.flat_fee
+    assert fee_params.fee == 4000
+    assert params.fee == 0
+
+
+def test_required_funds_scales_with_pools() -> None:
+    spec = PoolSpec(asset_a=11, asset_b=22, a_amount=1, b_amount=2)
+
+    assert required_funds([spec, spec]) == 2 * required_funds([spec])
+    assert required_funds([spec], seed_amount=0) < required_funds([spec])
+
+
+_private_key, _address = account.generate_account()
+DEPLOYER = algokit_utils.Account(private_key=_private_key, address=_address)
+GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+
+
+class _FakeAlgod:
+    """
+    Applies submitted groups to a toy ledger. `faults` maps a step to what goes wrong
+    with its next group: "rejected" (refused on submit), "dropped" (accepted, never
+    confirmed) or "unconfirmed" (lands, but reads as pending until `unconfirmed` is
+    cleared).
+    """
+
+    def __init__(self) -> None:
+        self.round = 1
+        self.groups: list[tuple[str, list[Transaction]]] = []
+        self.faults: dict[str, str] = {}
+        self.pending: dict[str, dict] = {}
+        self.unconfirmed: set[str] = set()
+        self.apps: dict[int, SimpleNamespace] = {}
+        self.creates: list[dict] = []
+        self._next_id = 1000
+        self._lock = threading.Lock()
+
+    def suggested_params(self) -> SuggestedParams:
+        return SuggestedParams(
+            fee=0,
+            first=self.round,
+            last=self.round + 1000,
+            gh=GENESIS_HASH,
+            min_fee=1000,
+        )
+
+    def status(self) -> dict:
+        return {"last-round": self.round}
+
+    def status_after_block(self, round_num: int) -> dict:
+        self.round = max(self.round, round_num + 1)
+        return self.status()
+
+    def pending_transaction_info(self, txid: str) -> dict:
+        if txid not in self.pending:
+            raise AlgodHTTPError("txn does not exist", 404)
+        if txid in self.unconfirmed:
+            return {"confirmed-round": 0, "pool-error": ""}
+        return self.pending[txid]
+
+    def account_info(self, address: str) -> dict:
+        assert address == DEPLOYER.address
+        return {"created-apps": [{"id": app_id} for app_id in self.apps]}
+
+    def send_transactions(self, signed_txns: list[SignedTransaction]) -> str:
+        txns = [stxn.transaction for stxn in signed_txns]
+        assert len(txns) <= 16
+        call = txns[-1]
+        assert isinstance(call, ApplicationCallTxn)
+        step = "create" if call.index == 0 else call.app_args[0].decode()
+        with self._lock:
+            self.groups.append((step, txns))
+            fault = self.faults.pop(step, None)
+            if fault == "rejected":
+                raise AlgodHTTPError("transaction rejected", 400)
+            if fault != "dropped":
+                self.round += 1
+                for txn in txns:
+                    self.pending[txn.get_txid()] = {"confirmed-round": self.round}
+                    if isinstance(txn, ApplicationCallTxn):
+                        self._apply(txn)
+                    if fault == "unconfirmed":
+                        self.unconfirmed.add(txn.get_txid())
+        return txns[0].get_txid()
+
+    def _apply(self, txn: ApplicationCallTxn) -> None:
+        if txn.index == 0:
+            self._next_id += 1
+            self.apps[self._next_id] = SimpleNamespace(pool_token=0, ratio=0)
+            self.pending[txn.get_txid()]["application-index"] = self._next_id
+            self.creates.append(
+                {
+                    "note": base64.b64encode(txn.note).decode(),
+                    "created-application-index": self._next_id,
+                    "confirmed-round": self.round,
+                }
+            )
+        elif txn.app_args[0] == b"bootstrap":
+            self._next_id += 1
+            self.apps[txn.index].pool_token = self._next_id
+        else:
+            self.apps[txn.index].ratio = 1000
+
+
+class _FakeIndexer:
+    def __init__(self, algod: _FakeAlgod, indexed_round: int | None = None) -> None:
+        self.algod = algod
+        # None keeps up with algod
+        self.indexed_round = indexed_round
+
+    def search_transactions(self, *, note_prefix: bytes, **_: object) -> dict:
+        current_round = self.algod.round
+        if self.indexed_round is not None:
+            current_round = self.indexed_round
+        return {
+            "current-round": current_round,
+            "transactions": [
+                txn
+                for txn in self.algod.creates
+                if txn["confirmed-round"] <= current_round
+                and base64.b64decode(txn["note"]).startswith(note_prefix)
+            ],
+        }
+
+
+class _FakeAppClient:
+    """Stands in for the generated client, adding plain calls in place of ABI ones."""
+
+    def __init__(
+        self, algod: _FakeAlgod, app_id: int, params: SuggestedParams | None
+    ) -> None:
+        self.algod = algod
+        self.app_id = app_id
+        assert params is not None
+        self.params = params
+        self.atc = AtomicTransactionComposer()
+
+    def compose(self, atc: AtomicTransactionComposer | None = None) -> "_FakeAppClient":
+        self.atc = atc or AtomicTransactionComposer()
+        return self
+
+    def create_bare(
+        self, *, transaction_parameters: algokit_utils.CreateTransactionParameters
+    ) -> None:
+        self._add(
+            ApplicationCreateTxn(
+                DEPLOYER.address,
+                self.params,
+                OnComplete.NoOpOC,
+                b"\x0a\x81\x01",
+                b"\x0a\x81\x01",
+                StateSchema(num_uints=4, num_byte_slices=1),
+                StateSchema(num_uints=0, num_byte_slices=0),
+                note=transaction_parameters.note,
+                lease=transaction_parameters.lease,
+            )
+        )
+
+    def bootstrap(
+        self,
+        *,
+        seed: TransactionWithSigner,
+        a_asset: int,
+        b_asset: int,
+        transaction_parameters: algokit_utils.TransactionParameters,
+    ) -> "_FakeAppClient":
+        self.atc.add_transaction(seed)
+        self._call(b"bootstrap", transaction_parameters, [a_asset, b_asset])
+        return self
+
+    def mint_lean(
+        self,
+        *,
+        a_xfer: TransactionWithSigner,
+        b_xfer: TransactionWithSigner,
+        transaction_parameters: algokit_utils.TransactionParameters,
+    ) -> None:
+        self.atc.add_transaction(a_xfer)
+        self.atc.add_transaction(b_xfer)
+        self._call(b"mint_lean", transaction_parameters)
+
+    def execute(self) -> SimpleNamespace:
+        self.atc.execute(self.algod, wait_rounds=4)  # type: ignore[arg-type]
+        pool_token = self.algod.apps[self.app_id].pool_token
+        return SimpleNamespace(abi_results=[SimpleNamespace(return_value=pool_token)])
+
+    def get_global_state(self) -> SimpleNamespace:
+        return self.algod.apps[self.app_id]
+
+    def _call(
+        self,
+        method: bytes,
+        transaction_parameters: algokit_utils.TransactionParameters,
+        foreign_assets: list[int] | None = None,
+    ) -> None:
+        self._add(
+            ApplicationNoOpTxn(
+                DEPLOYER.address,
+                transaction_parameters.suggested_params or self.params,
+                self.app_id,
+                app_args=[method],
+                foreign_assets=transaction_parameters.foreign_assets or foreign_assets,
+                boxes=transaction_parameters.boxes,
+            )
+        )
+
+    def _add(self, txn: Transaction) -> None:
+        self.atc.add_transaction(TransactionWithSigner(txn, DEPLOYER.signer))
+
+
+@pytest.fixture()
+def algod(monkeypatch: pytest.MonkeyPatch) -> _FakeAlgod:
+    algod = _FakeAlgod()
+
+    def client(deployer: PoolDeployer, app_id: int = 0) -> _FakeAppClient:
+        return _FakeAppClient(algod, app_id, deployer._suggested_params)
+
+    monkeypatch.setattr(PoolDeployer, "_client", client)
+    return algod
+
+
+def _deployer(
+    algod: _FakeAlgod, tmp_path: Path, indexer: _FakeIndexer | None = None
+) -> PoolDeployer:
+    # one worker keeps the order of groups within a step deterministic
+    return PoolDeployer(
+        algod,  # type: ignore[arg-type]
+        DEPLOYER,
+        tmp_path / "state.json",
+        indexer_client=indexer,  # type: ignore[arg-type]
+        max_workers=1,
+    )
+
+
+def _specs(count: int) -> list[PoolSpec]:
+    return [
+        PoolSpec(asset_a=10 + 2 * i, asset_b=11 + 2 * i, a_amount=1000, b_amount=2000)
+        for i in range(count)
+    ]
+
+
+def _steps(algod: _FakeAlgod) -> list[str]:
+    return [step for step, _ in algod.groups]
+
+
+def test_deploy_composes_groups_step_by_step(algod: _FakeAlgod, tmp_path: Path) -> None:
+    specs = _specs(17)
+
+    pools = _deployer(algod, tmp_path).deploy(specs)
+
+    assert _steps(algod) == ["create"] * 2 + ["bootstrap"] * 17 + ["mint_lean"] * 5
+    creates = [txns for step, txns in algod.groups if step == "create"]
+    assert [len(txns) for txns in creates] == [16, 1]
+    assert [txn.note for txn in creates[0] + creates[1]] == [
+        NOTE_PREFIX + spec.key.encode() for spec in specs
+    ]
+    bootstrap = algod.groups[2][1]
+    assert [txn.type for txn in bootstrap] == ["pay", "appl"]
+    mints = [txns for step, txns in algod.groups if step == "mint_lean"]
+    assert [len(txns) for txns in mints] == [16, 16, 16, 16, 4]
+    for txns in mints:
+        assert [txn.type for txn in txns] == ["axfer", "axfer", "axfer", "appl"] * (
+            len(txns) // 4
+        )
+        for opt_in, _a_xfer, _b_xfer, call in zip(*[iter(txns)] * 4, strict=True):
+            assert opt_in.receiver == DEPLOYER.address
+            assert opt_in.amount == 0
+            assert call.foreign_assets == [opt_in.index]
+            assert [(box.app_index, box.name) for box in call.boxes] == [
+                position_box(DEPLOYER.address)
+            ]
+    assert sorted(pool.app_id for pool in pools.values()) == sorted(algod.apps)
+    assert all(app.ratio for app in algod.apps.values())
+
+
+def test_partial_failure_resumes_where_it_stopped(
+    algod: _FakeAlgod, tmp_path: Path
+) -> None:
+    specs = _specs(5)
+    algod.faults["mint_lean"] = "rejected"
+
+    with pytest.raises(Exception, match="1 pool groups failed"):
+        _deployer(algod, tmp_path).deploy(specs)
+
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert [state[spec.key]["submitted"] for spec in specs] == ["mint"] * 4 + [None]
+    assert [state[spec.key]["seeded"] for spec in specs] == [False] * 4 + [True]
+    algod.groups.clear()
+
+    pools = _deployer(algod, tmp_path).deploy(specs)
+
+    assert _steps(algod) == ["mint_lean"]
+    assert len(algod.groups[0][1]) == 16
+    assert len(pools) == len(algod.apps) == 5
+    assert all(app.ratio for app in algod.apps.values())
+
+
+@pytest.mark.parametrize(
+    ("step", "submitted", "remaining"),
+    [("bootstrap", "bootstrap", ["mint_lean"]), ("mint_lean", "mint", [])],
+)
+def test_resume_reconciles_submitted_steps_that_landed(
+    algod: _FakeAlgod, tmp_path: Path, step: str, submitted: str, remaining: list[str]
+) -> None:
+    (spec,) = _specs(1)
+    algod.faults[step] = "unconfirmed"
+
+    with pytest.raises(Exception, match="1 pool groups failed"):
+        _deployer(algod, tmp_path).deploy([spec])
+
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert state[spec.key]["submitted"] == submitted
+    algod.groups.clear()
+
+    pools = _deployer(algod, tmp_path).deploy([spec])
+
+    assert _steps(algod) == remaining
+    (app,) = algod.apps.values()
+    assert pools[spec.key].pool_token == app.pool_token
+    assert app.ratio
+
+
+def test_resume_recovers_app_from_pending_create(
+    algod: _FakeAlgod, tmp_path: Path
+) -> None:
+    (spec,) = _specs(1)
+    algod.faults["create"] = "unconfirmed"
+    with pytest.raises(Exception, match="1 pool groups failed"):
+        _deployer(algod, tmp_path).deploy([spec])
+    algod.unconfirmed.clear()
+    algod.groups.clear()
+
+    pools = _deployer(algod, tmp_path).deploy([spec])
+
+    assert _steps(algod) == ["bootstrap", "mint_lean"]
+    assert [pools[spec.key].app_id] == list(algod.apps)
+
+
+def test_resume_finds_create_by_note_on_indexer(
+    algod: _FakeAlgod, tmp_path: Path
+) -> None:
+    # the note of 10-11 is a prefix of the note of 10-111
+    specs = [
+        PoolSpec(asset_a=10, asset_b=111, a_amount=1000, b_amount=2000),
+        PoolSpec(asset_a=10, asset_b=11, a_amount=1000, b_amount=2000),
+    ]
+    algod.faults["create"] = "unconfirmed"
+    with pytest.raises(Exception, match="1 pool groups failed"):
+        _deployer(algod, tmp_path).deploy(specs)
+    # the creates aged out of algod's pending cache
+    algod.pending.clear()
+    algod.groups.clear()
+
+    pools = _deployer(algod, tmp_path, _FakeIndexer(algod)).deploy(specs)
+
+    assert "create" not in _steps(algod)
+    assert [pools[spec.key].app_id for spec in specs] == list(algod.apps)
+
+
+@pytest.mark.parametrize(
+    "indexer_factory", [None, _FakeIndexer], ids=["no indexer", "indexer"]
+)
+def test_resume_recreates_create_that_never_landed(
+    algod: _FakeAlgod,
+    tmp_path: Path,
+    indexer_factory: type[_FakeIndexer] | None,
+) -> None:
+    (spec,) = _specs(1)
+    indexer = None
+    if indexer_factory is not None:
+        indexer = indexer_factory(algod)
+        # an unrelated app of the deployer's, which the indexer rules out
+        algod.apps[1] = SimpleNamespace(pool_token=0, ratio=0)
+    algod.faults["create"] = "dropped"
+    with pytest.raises(Exception, match="1 pool groups failed"):
+        _deployer(algod, tmp_path, indexer).deploy([spec])
+
+    # it could still land within its validity window
+    with pytest.raises(Exception, match="validity window"):
+        _deployer(algod, tmp_path, indexer).deploy([spec])
+
+    algod.round += 1000
+    algod.groups.clear()
+    pools = _deployer(algod, tmp_path, indexer).deploy([spec])
+
+    assert _steps(algod) == ["create", "bootstrap", "mint_lean"]
+    assert pools[spec.key].app_id == max(algod.apps)
+
+
+@pytest.mark.parametrize(
+    "indexed_round", [None, 1], ids=["no indexer", "lagging indexer"]
+)
+def test_resume_refuses_to_recreate_unproven_create(
+    algod: _FakeAlgod, tmp_path: Path, indexed_round: int | None
+) -> None:
+    (spec,) = _specs(1)
+    algod.faults["create"] = "unconfirmed"
+    with pytest.raises(Exception, match="1 pool groups failed"):
+        _deployer(algod, tmp_path).deploy([spec])
+    algod.pending.clear()
+    algod.round += 1000
+    algod.groups.clear()
+    indexer = None
+    if indexed_round is not None:
+        # the create landed after the round the indexer has reached
+        indexer = _FakeIndexer(algod, indexed_round)
+
+    with pytest.raises(Exception, match=r"deployer created apps \[1001\]"):
+        _deployer(algod, tmp_path, indexer).deploy([spec])
+
+    assert algod.groups == []
+    assert len(algod.apps) == 1
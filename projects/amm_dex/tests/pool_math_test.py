@@ -0,0 +1,93 @@
+from collections.abc import Iterator
+
+import pytest
+from algopy import UInt64
+from algopy_testing import AlgopyTestContext, algopy_testing_context
+
+from smart_contracts.amm_dex import contract, pool_math
+
+
+@pytest.fixture()
+def context() -> Iterator[AlgopyTestContext]:
+    with algopy_testing_context() as ctx:
+        yield ctx
+
+
+def test_constants_match_contract() -> None:
+    assert pool_math.TOTAL_SUPPLY == contract.TOTAL_SUPPLY
+    assert pool_math.SCALE == contract.SCALE
+    assert pool_math.FEE == contract.FEE
+
+
+@pytest.mark.usefixtures("context")
+@pytest.mark.parametrize(
+    ("in_amount", "in_supply", "out_supply"),
+    [(100, 1000, 2000), (1, 1_000_001, 1_000_000), (123_456, 10_000_000, 987_654)],
+)
+def test_tokens_to_swap_matches_contract(
+    in_amount: int, in_supply: int, out_supply: int
+) -> None:
+    expected = contract.tokens_to_swap(
+        in_amount=UInt64(in_amount),
+        in_supply=UInt64(in_supply),
+        out_supply=UInt64(out_supply),
+    )
+
+    assert (
+        pool_math.tokens_to_swap(
+            in_amount=in_amount, in_supply=in_supply, out_supply=out_supply
+        )
+        == expected
+    )
+
+
+@pytest.mark.usefixtures("context")
+@pytest.mark.parametrize(
+    ("pool_balance", "a_balance", "b_balance", "a_amount", "b_amount"),
+    [
+        (pool_math.TOTAL_SUPPLY, 1_000_000, 4_000_000, 1_000_000, 4_000_000),
+        (9_998_000_000, 3_000_000, 6_000_000, 1_000_000, 2_500_000),
+    ],
+)
+def test_tokens_to_mint_matches_contract(
+    pool_balance: int, a_balance: int, b_balance: int, a_amount: int, b_amount: int
+) -> None:
+    expected = contract.tokens_to_mint(
+        pool_balance=UInt64(pool_balance),
+        a_balance=UInt64(a_balance),
+        b_balance=UInt64(b_balance),
+        a_amount=UInt64(a_amount),
+        b_amount=UInt64(b_amount),
+    )
+
+    assert (
+        pool_math.tokens_to_mint(
+            pool_balance=pool_balance,
+            a_balance=a_balance,
+            b_balance=b_balance,
+            a_amount=a_amount,
+            b_amount=b_amount,
+        )
+        == expected
+    )
+
+
+@pytest.mark.usefixtures("context")
+def test_tokens_to_burn_matches_contract() -> None:
+    expected = contract.tokens_to_burn(
+        pool_balance=UInt64(9_990_000_000),
+        supply=UInt64(5_000_000),
+        amount=UInt64(1_000),
+    )
+
+    assert (
+        pool_math.tokens_to_burn(
+            pool_balance=9_990_000_000, supply=5_000_000, amount=1_000
+        )
+        == expected
+    )
+
+
+def test_overflow_is_reported() -> None:
+    with pytest.raises(OverflowError):
+        pool_math.tokens_to_swap(in_amount=2**40, in_supply=2**41, out_supply=2**40)
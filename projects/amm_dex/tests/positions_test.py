@@ -0,0 +1,208 @@
+import math
+from collections.abc import Iterator
+
+import pytest
+from algopy import Asset, UInt64, arc4
+from algopy_testing import AlgopyTestContext, algopy_testing_context
+
+from smart_contracts.amm_dex import contract, pool_math
+from smart_contracts.amm_dex.contract import ConstantProductAMM, Position
+
+A_AMOUNT = 1_000_000
+B_AMOUNT = 4_000_000
+MINTED = math.isqrt(A_AMOUNT * B_AMOUNT) - pool_math.SCALE
+
+
+@pytest.fixture()
+def context() -> Iterator[AlgopyTestContext]:
+    with algopy_testing_context() as ctx:
+        yield ctx
+
+
+@pytest.fixture()
+def pool(context: AlgopyTestContext) -> ConstantProductAMM:
+    amm = ConstantProductAMM()
+    amm.asset_a = context.any.asset()
+    amm.asset_b = context.any.asset()
+    amm.pool_token = context.any.asset()
+    return amm
+
+
+def _set_balances(
+    context: AlgopyTestContext, pool: ConstantProductAMM, a: int, b: int, lp: int
+) -> None:
+    address = context.ledger.get_app(pool).address
+    for asset, balance in ((pool.asset_a, a), (pool.asset_b, b), (pool.pool_token, lp)):
+        context.ledger.update_asset_holdings(asset, address, balance=balance)
+
+
+def _axfer(
+    context: AlgopyTestContext, pool: ConstantProductAMM, asset: Asset, amount: int
+) -> object:
+    return context.any.txn.asset_transfer(
+        sender=context.default_sender,
+        asset_receiver=context.ledger.get_app(pool).address,
+        xfer_asset=asset,
+        asset_amount=UInt64(amount),
+    )
+
+
+def _open(context: AlgopyTestContext, pool: ConstantProductAMM) -> None:
+    pool.open_position(
+        context.any.txn.payment(
+            sender=context.default_sender,
+            receiver=context.ledger.get_app(pool).address,
+            amount=UInt64(contract.POSITION_MBR),
+        )
+    )
+
+
+def _mint(
+    context: AlgopyTestContext, pool: ConstantProductAMM, *, lean: bool = True
+) -> None:
+    # balances already include the deposit when the app call runs
+    _set_balances(context, pool, A_AMOUNT, B_AMOUNT, pool_math.TOTAL_SUPPLY)
+    a_xfer = _axfer(context, pool, pool.asset_a, A_AMOUNT)
+    b_xfer = _axfer(context, pool, pool.asset_b, B_AMOUNT)
+    if lean:
+        pool.mint_lean(a_xfer, b_xfer)  # type: ignore[arg-type]
+    else:
+        pool.mint(
+            a_xfer,  # type: ignore[arg-type]
+            b_xfer,  # type: ignore[arg-type]
+            pool.pool_token,
+            pool.asset_a,
+            pool.asset_b,
+        )
+
+
+def _burn(
+    context: AlgopyTestContext, pool: ConstantProductAMM, amount: int, *, lean: bool
+) -> None:
+    pool_xfer = _axfer(context, pool, pool.pool_token, amount)
+    if lean:
+        pool.burn_lean(pool_xfer)  # type: ignore[arg-type]
+    else:
+        pool.burn(
+            pool_xfer,  # type: ignore[arg-type]
+            pool.pool_token,
+            pool.asset_a,
+            pool.asset_b,
+        )
+
+
+def _fields(position: Position) -> tuple[int, ...]:
+    return (
+        position.a_deposited.native,
+        position.b_deposited.native,
+        position.lp_minted.native,
+        position.a_withdrawn.native,
+        position.b_withdrawn.native,
+        position.lp_burned.native,
+    )
+
+
+# deposits and withdrawals made through the regular and lean methods end up in the
+# same position, so mixing them still gives a complete cost basis
+@pytest.mark.parametrize(
+    ("lean_mint", "lean_burn"),
+    [(True, True), (False, True), (True, False), (False, False)],
+    ids=["lean", "mint+burn_lean", "mint_lean+burn", "regular"],
+)
+def test_mint_and_burn_accumulate_into_open_position(
+    context: AlgopyTestContext,
+    pool: ConstantProductAMM,
+    *,
+    lean_mint: bool,
+    lean_burn: bool,
+) -> None:
+    _open(context, pool)
+    _mint(context, pool, lean=lean_mint)
+    burned = MINTED // 4
+    _set_balances(
+        context, pool, A_AMOUNT, B_AMOUNT, pool_math.TOTAL_SUPPLY - MINTED + burned
+    )
+
+    _burn(context, pool, burned, lean=lean_burn)
+
+    a_withdrawn = pool_math.tokens_to_burn(
+        pool_balance=pool_math.TOTAL_SUPPLY - MINTED + burned,
+        supply=A_AMOUNT,
+        amount=burned,
+    )
+    b_withdrawn = pool_math.tokens_to_burn(
+        pool_balance=pool_math.TOTAL_SUPPLY - MINTED + burned,
+        supply=B_AMOUNT,
+        amount=burned,
+    )
+    assert _fields(pool.positions[context.default_sender]) == (
+        A_AMOUNT,
+        B_AMOUNT,
+        MINTED,
+        a_withdrawn,
+        b_withdrawn,
+        burned,
+    )
+
+
+def test_mint_without_position_records_nothing(
+    context: AlgopyTestContext, pool: ConstantProductAMM
+) -> None:
+    _mint(context, pool)
+
+    assert context.default_sender not in pool.positions
+
+
+def test_open_position_requires_box_minimum_balance(
+    context: AlgopyTestContext, pool: ConstantProductAMM
+) -> None:
+    with pytest.raises(AssertionError, match="amount minimum not met"):
+        pool.open_position(
+            context.any.txn.payment(
+                sender=context.default_sender,
+                receiver=context.ledger.get_app(pool).address,
+                amount=UInt64(contract.POSITION_MBR - 1),
+            )
+        )
+    _open(context, pool)
+    with pytest.raises(AssertionError, match="position already open"):
+        _open(context, pool)
+
+
+def test_close_position_refunds_minimum_balance(
+    context: AlgopyTestContext, pool: ConstantProductAMM
+) -> None:
+    _open(context, pool)
+
+    pool.close_position()
+
+    assert context.default_sender not in pool.positions
+    refund = context.txn.last_group.last_itxn.payment
+    assert refund.receiver == context.default_sender
+    assert refund.amount == contract.POSITION_MBR
+
+
+# algopy_testing cannot decode an array of more than one struct, so the batch
+# getter is exercised one account at a time and compared by encoding
+@pytest.mark.parametrize("opened", [True, False])
+def test_get_positions_returns_recorded_or_zero_position(
+    context: AlgopyTestContext, pool: ConstantProductAMM, *, opened: bool
+) -> None:
+    if opened:
+        _open(context, pool)
+    _mint(context, pool)
+    expected = (A_AMOUNT, B_AMOUNT, MINTED, 0, 0, 0) if opened else (0,) * 6
+
+    positions = pool.get_positions(
+        arc4.DynamicArray(arc4.Address(context.default_sender))
+    )
+
+    assert positions.bytes == b"\x00\x01" + b"".join(
+        value.to_bytes(8, "big") for value in expected
+    )
+
+
+def test_position_box_name_matches_client() -> None:
+    from smart_contracts.amm_dex import lean_client
+
+    assert lean_client.POSITION_BOX_PREFIX == contract.POSITION_BOX_PREFIX
@@ -0,0 +1,134 @@
+from collections.abc import Iterator
+
+import pytest
+from algopy import Asset, UInt64
+from algopy_testing import AlgopyTestContext, algopy_testing_context
+
+from smart_contracts.amm_dex import contract, pool_math
+from smart_contracts.amm_dex.contract import ConstantProductAMM
+
+A_RESERVE = 1_000_000
+B_RESERVE = 2_000_000
+
+
+@pytest.fixture()
+def context() -> Iterator[AlgopyTestContext]:
+    with algopy_testing_context() as ctx:
+        yield ctx
+
+
+@pytest.fixture()
+def pool(context: AlgopyTestContext) -> ConstantProductAMM:
+    amm = ConstantProductAMM()
+    amm.asset_a = context.any.asset()
+    amm.asset_b = context.any.asset()
+    amm.pool_token = context.any.asset()
+    context.ledger.patch_global_fields(round=UInt64(100))
+    return amm
+
+
+def _swap(
+    context: AlgopyTestContext,
+    pool: ConstantProductAMM,
+    asset: Asset,
+    amount: int,
+    *,
+    min_out: int = 0,
+    max_price_impact_bps: int = pool_math.BPS,
+    expires_at: int = 0,
+) -> UInt64:
+    app = context.ledger.get_app(pool)
+    # balances already include the incoming transfer when the app call runs
+    for pool_asset, reserve in ((pool.asset_a, A_RESERVE), (pool.asset_b, B_RESERVE)):
+        balance = reserve + amount if pool_asset == asset else reserve
+        context.ledger.update_asset_holdings(pool_asset, app.address, balance=balance)
+    swap_xfer = context.any.txn.asset_transfer(
+        sender=context.default_sender,
+        asset_receiver=app.address,
+        xfer_asset=asset,
+        asset_amount=UInt64(amount),
+    )
+    return pool.swap_lean(
+        swap_xfer, UInt64(min_out), UInt64(max_price_impact_bps), UInt64(expires_at)
+    )
+
+
+@pytest.mark.parametrize(("a_to_b"), [True, False])
+def test_swap_pays_out_the_other_asset(
+    context: AlgopyTestContext, pool: ConstantProductAMM, a_to_b: bool  # noqa: FBT001
+) -> None:
+    in_asset, out_asset = (
+        (pool.asset_a, pool.asset_b) if a_to_b else (pool.asset_b, pool.asset_a)
+    )
+    in_reserve, out_reserve = (
+        (A_RESERVE, B_RESERVE) if a_to_b else (B_RESERVE, A_RESERVE)
+    )
+
+    out = _swap(context, pool, in_asset, 10_000)
+
+    expected = pool_math.tokens_to_swap(
+        in_amount=10_000, in_supply=in_reserve + 10_000, out_supply=out_reserve
+    )
+    assert out == expected
+    payout = context.txn.last_group.last_itxn.asset_transfer
+    assert payout.xfer_asset == out_asset
+    assert payout.asset_amount == expected
+
+
+def test_min_out(context: AlgopyTestContext, pool: ConstantProductAMM) -> None:
+    expected = pool_math.tokens_to_swap(
+        in_amount=10_000, in_supply=A_RESERVE + 10_000, out_supply=B_RESERVE
+    )
+
+    assert _swap(context, pool, pool.asset_a, 10_000, min_out=expected) == expected
+    with pytest.raises(AssertionError, match="output below minimum"):
+        _swap(context, pool, pool.asset_a, 10_000, min_out=expected + 1)
+
+
+def test_max_price_impact(context: AlgopyTestContext, pool: ConstantProductAMM) -> None:
+    # 10% of the reserve moves the price by roughly 9%
+    amount = A_RESERVE // 10
+
+    assert _swap(context, pool, pool.asset_a, amount, max_price_impact_bps=950)
+    with pytest.raises(AssertionError, match="price impact too high"):
+        _swap(context, pool, pool.asset_a, amount, max_price_impact_bps=850)
+
+
+def test_expiry(context: AlgopyTestContext, pool: ConstantProductAMM) -> None:
+    assert _swap(context, pool, pool.asset_a, 10_000, expires_at=100)
+    with pytest.raises(AssertionError, match="swap expired"):
+        _swap(context, pool, pool.asset_a, 10_000, expires_at=99)
+
+
+@pytest.mark.usefixtures("context")
+@pytest.mark.parametrize(
+    ("in_amount", "in_supply", "out_supply", "out_amount", "max_bps"),
+    [
+        (100_000, 1_100_000, 2_000_000, 180_909, 900),
+        (100_000, 1_100_000, 2_000_000, 180_909, 950),
+        (1, 2**63, 2**63, 0, 0),
+        (2**40, 2**62, 2**62, 2**39, 5_000),
+        (10, 20, 30, 1, pool_math.BPS),
+    ],
+)
+def test_within_price_impact_matches_contract(
+    in_amount: int, in_supply: int, out_supply: int, out_amount: int, max_bps: int
+) -> None:
+    expected = contract.within_price_impact(
+        in_amount=UInt64(in_amount),
+        in_supply=UInt64(in_supply),
+        out_supply=UInt64(out_supply),
+        out_amount=UInt64(out_amount),
+        max_bps=UInt64(max_bps),
+    )
+
+    assert (
+        pool_math.within_price_impact(
+            in_amount=in_amount,
+            in_supply=in_supply,
+            out_supply=out_supply,
+            out_amount=out_amount,
+            max_bps=max_bps,
+        )
+        == expected
+    )
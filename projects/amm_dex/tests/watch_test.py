@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from smart_contracts._helpers import watch as watch_module
+from smart_contracts._helpers.config import SmartContract
+
+
+class _StopWatchingError(Exception):
+    pass
+
+
+@pytest.fixture()
+def contract(tmp_path: Path) -> SmartContract:
+    path = tmp_path / "amm_dex" / "contract.py"
+    path.parent.mkdir()
+    path.write_text("")
+    return SmartContract(path=path, name="amm_dex")
+
+
+@pytest.fixture()
+def builds(monkeypatch: pytest.MonkeyPatch) -> list[tuple[Path, Path]]:
+    builds: list[tuple[Path, Path]] = []
+
+    def build_in_process(output_dir: Path, contract_path: Path) -> Path:
+        builds.append((output_dir, contract_path))
+        return output_dir / "Contract.arc32.json"
+
+    monkeypatch.setattr(watch_module, "build_in_process", build_in_process)
+    monkeypatch.setattr(watch_module, "has_in_process_backend", lambda: True)
+    return builds
+
+
+def test_watch_rebuilds_saved_contract(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    contract: SmartContract,
+    builds: list[tuple[Path, Path]],
+) -> None:
+    sleeps = 0
+
+    def sleep(_: float) -> None:
+        nonlocal sleeps
+        sleeps += 1
+        if sleeps == 2:
+            # saved between the first and second poll
+            mtime = contract.path.stat().st_mtime_ns + 1_000_000_000
+            os.utime(contract.path, ns=(mtime, mtime))
+        elif sleeps == 4:
+            raise _StopWatchingError
+
+    monkeypatch.setattr(watch_module.time, "sleep", sleep)
+
+    with pytest.raises(_StopWatchingError):
+        watch_module.watch([contract], tmp_path / "artifacts")
+
+    # the initial build, then one rebuild for the single save
+    assert builds == [(tmp_path / "artifacts" / "amm_dex", contract.path)] * 2
+
+
+def test_failed_rebuild_is_logged_and_watching_continues(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    contract: SmartContract,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    def build_in_process(output_dir: Path, contract_path: Path) -> Path:
+        raise Exception("Could not build contract")
+
+    monkeypatch.setattr(watch_module, "build_in_process", build_in_process)
+
+    watch_module._rebuild(contract, tmp_path / "artifacts")
+
+    assert f"Could not build {contract.path}" in caplog.text
+
+
+def test_watch_requires_in_process_backend(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    contract: SmartContract,
+    builds: list[tuple[Path, Path]],
+) -> None:
+    monkeypatch.setattr(watch_module, "has_in_process_backend", lambda: False)
+
+    with pytest.raises(Exception, match="requires puyapy"):
+        watch_module.watch([contract], tmp_path / "artifacts")
+
+    assert builds == []